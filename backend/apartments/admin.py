@@ -1,7 +1,12 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
-from django.db.models import Avg
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from bookings.models import Booking
 from .models import Apartment, ApartmentImage, Amenity
+from .pagination import EstimatedCountPaginator
+from .services import search_cache
 
 class ApartmentImageInline(admin.TabularInline):
     model = ApartmentImage
@@ -17,6 +22,25 @@ class ApartmentImageInline(admin.TabularInline):
             )
         return "No image"
 
+class BedroomsFilter(admin.SimpleListFilter):
+    # Fixed choices, so rendering the filter needs no DISTINCT query.
+    title = 'bedrooms'
+    parameter_name = 'bedrooms_range'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('1', '1'),
+            ('2', '2'),
+            ('3', '3'),
+            ('4+', '4+'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == '4+':
+            return queryset.filter(bedrooms__gte=4)
+        if self.value() in ('1', '2', '3'):
+            return queryset.filter(bedrooms=int(self.value()))
+
 class PriceRangeFilter(admin.SimpleListFilter):
     title = 'price range'
     parameter_name = 'price_range'
@@ -54,11 +78,13 @@ class ApartmentAdmin(admin.ModelAdmin):
     )
     list_filter = (
         'is_available', 
-        'city', 
-        'bedrooms',
+        BedroomsFilter,
         PriceRangeFilter
     )
-    search_fields = ('title', 'description', 'address', 'owner__email')
+    search_fields = ('title', 'description', 'address', 'city', 'owner__email')
+    autocomplete_fields = ('owner',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     inlines = [ApartmentImageInline]
     actions = ['mark_as_available', 'mark_as_unavailable']
     
@@ -78,23 +104,44 @@ class ApartmentAdmin(admin.ModelAdmin):
     )
 
 
+    def get_queryset(self, request):
+        # Per-row columns come from this one query; a correlated count keeps
+        # the changelist's COUNT(*) free of joins.
+        booking_total = (
+            Booking.objects.filter(apartment=OuterRef('pk'))
+            .order_by().values('apartment').annotate(total=Count('pk')).values('total')
+        )
+        return (
+            super().get_queryset(request)
+            .select_related('owner', 'property_type')
+            .annotate(booking_total=Coalesce(Subquery(booking_total), 0))
+        )
+
     def average_rating(self, obj):
-        avg = obj.reviews.aggregate(Avg('rating'))['rating__avg']
-        if avg:
-            return round(avg, 2)
+        if obj.average_rating:
+            return round(obj.average_rating, 2)
         return 'No ratings'
     average_rating.short_description = 'Avg Rating'
+    average_rating.admin_order_field = 'average_rating'
 
     def booking_count(self, obj):
-        return obj.bookings.count()
+        return obj.booking_total
     booking_count.short_description = 'Bookings'
+    booking_count.admin_order_field = 'booking_total'
+
+    def _set_available(self, queryset, is_available):
+        # Read the IDs first: on a changelist filtered by is_available the
+        # updated rows drop out of the queryset.
+        apartment_ids = list(queryset.values_list('id', flat=True))
+        queryset.update(is_available=is_available, updated_at=timezone.now())
+        search_cache.invalidate_apartments(apartment_ids)
 
     def mark_as_available(self, request, queryset):
-        queryset.update(is_available=True)
+        self._set_available(queryset, True)
     mark_as_available.short_description = "Mark selected apartments as available"
 
     def mark_as_unavailable(self, request, queryset):
-        queryset.update(is_available=False)
+        self._set_available(queryset, False)
     mark_as_unavailable.short_description = "Mark selected apartments as unavailable"
 
 @admin.register(Amenity)
@@ -102,7 +149,11 @@ class AmenityAdmin(admin.ModelAdmin):
     list_display = ('name', 'icon', 'apartments_count')
     search_fields = ('name',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(apartments_total=Count('apartments'))
+
     def apartments_count(self, obj):
-        return obj.apartments.count()
+        return obj.apartments_total
     apartments_count.short_description = 'Number of Apartments'
+    apartments_count.admin_order_field = 'apartments_total'
 
@@ -0,0 +1,24 @@
+from rest_framework import filters
+
+from .services import search_engine, text_search
+
+
+class ListingSearchFilter(filters.SearchFilter):
+    """SearchFilter backed by the apartment full-text index.
+
+    The index covers text_search.TEXT_FIELDS, so it is used only when the
+    view's search_fields are exactly those; any other search_fields get the
+    plain SearchFilter. Matches are ordered by relevance unless the request
+    asks for another ordering, which OrderingFilter applies afterwards.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request) or ()
+        if set(search_fields) != set(text_search.TEXT_FIELDS):
+            return super().filter_queryset(request, queryset, view)
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        query = search_engine.ListingQuery(text=' '.join(terms), available_only=False)
+        queryset = search_engine.queryset(query, base=queryset)
+        return queryset.order_by('-search_rank', '-created_at')
@@ -0,0 +1,51 @@
+import time
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from apartments.pagination import SearchCursorPagination
+from apartments.services import search_engine
+
+DEFAULT_QUERIES = [
+    'browse_all=true',
+    'browse_all=true&min_price=500&max_price=1500&bedrooms=2',
+    'browse_all=true&location=bishkek&ordering=price_per_month',
+    'browse_all=true&amenities=wifi&ordering=recommended',
+]
+
+
+class Command(BaseCommand):
+    help = "Time one /api/search/ page on each search backend, bypassing the page cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', help="Query strings, e.g. 'browse_all=true&bedrooms=2'.")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        backends = [search_engine.orm_backend, search_engine.snapshot_backend]
+
+        for query_string in options['queries'] or DEFAULT_QUERIES:
+            request = Request(factory.get(f'/api/search/?{query_string}'))
+            query = search_engine.ListingQuery.from_params(request.query_params)
+            self.stdout.write(query_string)
+
+            pages = {}
+            for backend in backends:
+                if not backend.supports(query):
+                    self.stdout.write(f'  {backend.name:<9} not supported')
+                    continue
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    page, _ = search_engine.search_page(query, request, SearchCursorPagination(), backend=backend)
+                    timings.append((time.perf_counter() - started) * 1000)
+                pages[backend.name] = [apartment.pk for apartment in page]
+                self.stdout.write(
+                    f'  {backend.name:<9} median {median(timings):.2f} ms, best {min(timings):.2f} ms'
+                )
+
+            if len(pages) > 1 and len(set(map(tuple, pages.values()))) > 1:
+                self.stdout.write(self.style.WARNING('  backends returned different pages'))
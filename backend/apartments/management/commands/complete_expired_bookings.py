@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apartments.services import expiry
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark pending and approved bookings whose end date has passed as "
+        "completed. run_scheduled_jobs runs it hourly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = expiry.complete_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{total} bookings completed."))
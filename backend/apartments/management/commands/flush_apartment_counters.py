@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apartments.services import counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the view, favorite and booking counts buffered in "
+        "COUNTERS_CACHE to Apartment. run_scheduled_jobs runs it every minute."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        applied = counters.flush(batch_size=options['batch_size'])
+        if applied is None:
+            self.stdout.write("Another flush is running.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{applied} counters flushed."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apartments.services import amenity_index
+
+
+class Command(BaseCommand):
+    help = "Recompute Apartment.amenity_mask from the Amenity.apartments table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        amenity_index.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS("Amenity index rebuilt."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apartments.services import availability
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-apartment availability bitmaps and roll their "
+        f"{availability.HORIZON_MONTHS}-month horizon forward. Run daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        availability.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS("Availability bitmaps rebuilt."))
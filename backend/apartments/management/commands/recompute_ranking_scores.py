@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apartments.services import ranking
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Apartment.ranking_score from bookings, favorites, views, "
+        "ratings and listing age. Run daily so the recency decay advances."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ranking.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS("Ranking scores recomputed."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apartments.services import ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Apartment.average_rating, review_count and the per-star "
+        "counts from the reviews table. The Review signals keep them current; "
+        "run this after bulk edits that bypass signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ratings.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS("Rating aggregates recomputed."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apartments.services import counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Apartment.favorites_count and bookings_count from the "
+        "favorite and booking tables. run_scheduled_jobs runs it nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counters.reconcile(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS("Apartment counters reconciled."))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+KEY_PREFIX = 'scheduler'
+
+# (management command, seconds between runs)
+JOBS = (
+    ('flush_apartment_counters', 60),
+    ('complete_expired_bookings', 3600),
+    ('rebuild_availability', 86400),
+    ('recompute_ranking_scores', 86400),
+    ('reconcile_apartment_counters', 86400),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the periodic maintenance commands on their intervals. This is "
+        "the Procfile clock process; run exactly one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=10.0, help="Seconds between checks.")
+
+    def claim(self, name, every):
+        # The claim expires after the job's interval. It lives in the shared
+        # cache, so a restarted clock does not rerun daily jobs early and a
+        # second clock process cannot run the same job twice.
+        return cache.add(f'{KEY_PREFIX}:{name}', time.time(), timeout=every)
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            for name, every in JOBS:
+                if not self.claim(name, every):
+                    continue
+                try:
+                    call_command(name, stdout=self.stdout, stderr=self.stderr)
+                except Exception as error:  # one failing job must not stop the others
+                    self.stderr.write(f"{name} failed: {error!r}")
+            time.sleep(options['interval'])
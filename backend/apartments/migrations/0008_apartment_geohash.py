@@ -0,0 +1,75 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:41
+
+from django.db import migrations, models
+
+# The encoding as of this migration, kept here so later changes to
+# apartments.services.geo cannot alter it.
+GEOHASH_PRECISION = 12
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def backfill_geohash(apps, schema_editor):
+    Apartment = apps.get_model('apartments', 'Apartment')
+    batch = []
+    apartments = Apartment.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    for apartment in apartments.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        apartment.geohash = encode_geohash(apartment.latitude, apartment.longitude)
+        batch.append(apartment)
+        if len(batch) >= 2000:
+            Apartment.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        Apartment.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0007_alter_apartment_max_guests_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apartment',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Derived from latitude/longitude, used as the spatial index.', max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='apartment',
+            index=models.Index(fields=['latitude', 'longitude'], name='apartments__latitud_56e7da_idx'),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:42
+
+from datetime import date, timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The bitmap layout as of this migration, kept here so later changes to
+# apartments.services.availability cannot alter it.
+HORIZON_MONTHS = 18
+
+
+def month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def month_start(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def night_masks(start, end):
+    masks = {}
+    day = start
+    while day < end:
+        month = month_index(day)
+        last = min(end, month_start(month + 1))
+        masks[month] = masks.get(month, 0) | (((1 << (last - day).days) - 1) << (day.day - 1))
+        day = last
+    return masks
+
+
+def build_masks(bookings, periods, first, last):
+    masks = {}
+
+    def fold(apartment_id, start, end, slot):
+        for month, mask in night_masks(start, end).items():
+            if first <= month < last:
+                masks.setdefault((apartment_id, month), [0, 0])[slot] |= mask
+
+    for apartment_id, start, end in bookings:
+        fold(apartment_id, start, end, 0)
+    for apartment_id, start, end, is_available in periods:
+        fold(apartment_id, start, end + timedelta(days=1), 1 if is_available else 0)
+    return masks
+
+
+def build_bitmaps(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    ApartmentAvailability = apps.get_model('apartments', 'ApartmentAvailability')
+    AvailabilityMonth = apps.get_model('apartments', 'AvailabilityMonth')
+
+    first = month_index(date.today())
+    last = first + HORIZON_MONTHS
+    range_start, range_end = month_start(first), month_start(last)
+    bookings = Booking.objects.filter(
+        status__in=['approved', 'pending'],
+        start_date__lt=range_end,
+        end_date__gt=range_start
+    ).values_list('apartment_id', 'start_date', 'end_date')
+    periods = ApartmentAvailability.objects.filter(
+        start_date__lt=range_end,
+        end_date__gte=range_start
+    ).values_list('apartment_id', 'start_date', 'end_date', 'is_available')
+
+    masks = build_masks(bookings.iterator(), periods.iterator(), first, last)
+    AvailabilityMonth.objects.bulk_create([
+        AvailabilityMonth(apartment_id=apartment_id, month=month, blocked_days=blocked, open_days=open_)
+        for (apartment_id, month), (blocked, open_) in masks.items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0008_apartment_geohash'),
+        ('bookings', '0009_booking_booking_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.IntegerField(help_text='year * 12 + (month - 1)')),
+                ('blocked_days', models.IntegerField(default=0, help_text='Nights held by pending/approved bookings or unavailable periods.')),
+                ('open_days', models.IntegerField(default=0, help_text='Nights covered by an available ApartmentAvailability period.')),
+                ('apartment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_months', to='apartments.apartment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'apartment'], name='apartments__month_9fb656_idx')],
+                'unique_together': {('apartment', 'month')},
+            },
+        ),
+        migrations.RunPython(build_bitmaps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:46
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Trigram indexes match the UPPER(col::text) LIKE '%...%' that Django emits
+# for icontains on PostgreSQL. Other databases skip these statements.
+TRIGRAM_INDEXES = {
+    'apartments_apartment_city_trgm': 'city',
+    'apartments_apartment_country_trgm': 'country',
+    'apartments_apartment_address_trgm': 'address',
+}
+VECTOR_INDEX = 'apartments_apartment_search_vector_gin'
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON apartments_apartment '
+            f'USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {VECTOR_INDEX} ON apartments_apartment '
+        f'USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        "UPDATE apartments_apartment SET search_vector = "
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(country, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(address, '')), 'C') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'D')"
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in [*TRIGRAM_INDEXES, VECTOR_INDEX]:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0009_availabilitymonth'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='apartment',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
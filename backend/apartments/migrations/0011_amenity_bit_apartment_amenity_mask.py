@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:47
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def build_amenity_index(apps, schema_editor):
+    Amenity = apps.get_model('apartments', 'Amenity')
+    Apartment = apps.get_model('apartments', 'Apartment')
+
+    for bit, amenity in enumerate(Amenity.objects.order_by('id')[:63]):
+        amenity.bit = bit
+        amenity.save(update_fields=['bit'])
+
+    masks = defaultdict(int)
+    links = Amenity.apartments.through.objects.filter(
+        amenity__bit__isnull=False
+    ).values_list('apartment_id', 'amenity__bit')
+    for apartment_id, bit in links.iterator():
+        masks[apartment_id] |= 1 << bit
+
+    by_mask = defaultdict(list)
+    for apartment_id, mask in masks.items():
+        by_mask[mask].append(apartment_id)
+    for mask, apartment_ids in by_mask.items():
+        Apartment.objects.filter(id__in=apartment_ids).update(amenity_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0010_apartment_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='amenity',
+            name='bit',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, help_text='Position in Apartment.amenity_mask, empty once all bits are taken.', null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='apartment',
+            name='amenity_mask',
+            field=models.BigIntegerField(default=0, editable=False, help_text="Bitmask of Amenity.bit for this apartment's amenities."),
+        ),
+        migrations.RunPython(build_amenity_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:52
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count
+from django.utils import timezone
+
+
+# The scoring formula as of this migration, kept here so later changes to
+# apartments.services.ranking cannot alter it.
+def score(bookings, favorites, views, rating, created_at, now):
+    engagement = 3.0 * math.log1p(bookings) + 2.0 * math.log1p(favorites) + 1.0 * math.log1p(views)
+    age_days = max((now - created_at).total_seconds() / 86400, 0.0)
+    freshness = 5.0 * 0.5 ** (age_days / 30.0)
+    return round(engagement + (rating or 0.0) + freshness, 6)
+
+
+def compute_ranking_scores(apps, schema_editor):
+    Apartment = apps.get_model('apartments', 'Apartment')
+    Booking = apps.get_model('bookings', 'Booking')
+    Favorite = apps.get_model('favorites', 'Favorite')
+    Review = apps.get_model('reviews', 'Review')
+
+    bookings = dict(
+        Booking.objects.filter(status__in=['pending', 'approved', 'completed'])
+        .values_list('apartment_id').annotate(Count('id')).order_by()
+    )
+    favorites = dict(Favorite.objects.values_list('apartment_id').annotate(Count('id')).order_by())
+    ratings = dict(Review.objects.values_list('apartment_id').annotate(Avg('rating')).order_by())
+
+    now = timezone.now()
+    rows = Apartment.objects.values_list('id', 'views_count', 'created_at')
+    updates = [
+        Apartment(id=apartment_id, ranking_score=score(
+            bookings.get(apartment_id, 0), favorites.get(apartment_id, 0),
+            views, ratings.get(apartment_id), created_at, now
+        ))
+        for apartment_id, views, created_at in rows.iterator()
+    ]
+    Apartment.objects.bulk_update(updates, ['ranking_score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0011_amenity_bit_apartment_amenity_mask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bookings', '0009_booking_booking_type'),
+        ('favorites', '0001_initial'),
+        ('reviews', '0003_landlordreview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apartment',
+            name='ranking_score',
+            field=models.FloatField(default=0, editable=False, help_text='Stored relevance for ordering=recommended, see services/ranking.py.'),
+        ),
+        migrations.AddIndex(
+            model_name='apartment',
+            index=models.Index(fields=['ranking_score', 'id'], name='apartments__ranking_e24ed2_idx'),
+        ),
+        migrations.RunPython(compute_ranking_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:12
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def compute_rating_aggregates(apps, schema_editor):
+    Apartment = apps.get_model('apartments', 'Apartment')
+    Review = apps.get_model('reviews', 'Review')
+
+    counts = {}
+    rows = Review.objects.values_list('apartment_id', 'rating').annotate(total=Count('id')).order_by()
+    for apartment_id, rating, total in rows:
+        counts.setdefault(apartment_id, {})[rating] = total
+
+    updates = []
+    for apartment in Apartment.objects.filter(id__in=counts).only('id').iterator():
+        stars = counts[apartment.id]
+        apartment.review_count = sum(stars.values())
+        apartment.average_rating = sum(rating * total for rating, total in stars.items()) / apartment.review_count
+        for rating in range(1, 6):
+            setattr(apartment, f'rating_{rating}_count', stars.get(rating, 0))
+        updates.append(apartment)
+    Apartment.objects.bulk_update(
+        updates,
+        ['average_rating', 'review_count', *(f'rating_{rating}_count' for rating in range(1, 6))],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0012_apartment_ranking_score'),
+        ('reviews', '0003_landlordreview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apartment',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='apartment',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='apartment',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='apartment',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='apartment',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='apartment',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(compute_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
+from .services.geo import encode_geohash
 
 class PropertyType(models.Model):
     name = models.CharField(max_length=50)
@@ -15,9 +17,19 @@ class PropertyType(models.Model):
         verbose_name_plural = "Property Types"
 
 class Amenity(models.Model):
+    # Bits available in Apartment.amenity_mask; the sign bit is left unused.
+    MAX_INDEXED = 63
+
     name = models.CharField(max_length=100)
     icon = models.CharField(max_length=50, null=True, blank=True, help_text="Bootstrap icon class name")
     apartments = models.ManyToManyField('Apartment', related_name='amenities')
+    bit = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+        help_text="Position in Apartment.amenity_mask, empty once all bits are taken."
+    )
 
     class Meta:
         verbose_name_plural = "amenities"
@@ -26,6 +38,28 @@ class Amenity(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding or self.bit is not None:
+            return super().save(*args, **kwargs)
+        # Concurrent creates can pick the same free bit; the unique constraint
+        # rejects all but one and the others pick again. Every rejection
+        # means another amenity took a bit, so this ends once they run out.
+        for attempt in range(self.MAX_INDEXED + 1):
+            taken = set(Amenity.objects.filter(bit__isnull=False).values_list('bit', flat=True))
+            self.bit = next((bit for bit in range(self.MAX_INDEXED) if bit not in taken), None)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if self.bit is None or attempt == self.MAX_INDEXED:
+                    raise
+
+class ApartmentQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Prefetch what the listing serializers render, so a page costs a
+        fixed number of queries however many apartments it holds."""
+        return self.prefetch_related('images', 'amenities')
+
 class Apartment(models.Model):
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -73,12 +107,40 @@ class Apartment(models.Model):
 
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        editable=False,
+        db_index=True,
+        help_text="Derived from latitude/longitude, used as the spatial index."
+    )
+
+    search_vector = SearchVectorField(null=True, editable=False)
+    amenity_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        help_text="Bitmask of Amenity.bit for this apartment's amenities."
+    )
+
+    objects = ApartmentQuerySet.as_manager()
 
     # Extra stats for analytics & sorting
+    # Rating aggregates, kept current by the Review signals (services/ratings.py).
     average_rating = models.FloatField(null=True, blank=True)
+    review_count = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
     bookings_count = models.PositiveIntegerField(default=0)
     favorites_count = models.PositiveIntegerField(default=0)
     views_count = models.PositiveIntegerField(default=0)
+    ranking_score = models.FloatField(
+        default=0,
+        editable=False,
+        help_text="Stored relevance for ordering=recommended, see services/ranking.py."
+    )
 
     class Meta:
         ordering = ['-created_at']
@@ -87,13 +149,27 @@ class Apartment(models.Model):
             models.Index(fields=['price_per_month']),
             models.Index(fields=['is_available']),
             models.Index(fields=['property_type']),
+            models.Index(fields=['latitude', 'longitude']),
+            models.Index(fields=['ranking_score', 'id']),
         ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
     def get_primary_image(self):
-        return self.images.filter(is_primary=True).first() or self.images.first()
+        # Reads prefetched images when present instead of querying again.
+        images = list(self.images.all())
+        return next((image for image in images if image.is_primary), None) or (images[0] if images else None)
 
     @property
     def price_range(self):
@@ -102,6 +178,10 @@ class Apartment(models.Model):
             'max': self.price_per_month
         }
 
+    @property
+    def rating_counts(self):
+        return {stars: getattr(self, f'rating_{stars}_count') for stars in range(1, 6)}
+
     @property
     def popularity_score(self):
         return (
@@ -179,3 +259,35 @@ class ApartmentAvailability(models.Model):
         if overlapping.exists():
             raise ValidationError("This period overlaps with an existing availability period")
 
+
+
+class AvailabilityMonth(models.Model):
+    """Day bitmaps of one apartment for one calendar month.
+
+    Bit `n - 1` stands for the night starting on day `n` of the month.
+    Maintained from Booking and ApartmentAvailability rows by
+    apartments.services.availability.
+    """
+    apartment = models.ForeignKey(
+        Apartment,
+        on_delete=models.CASCADE,
+        related_name='availability_months'
+    )
+    month = models.IntegerField(help_text="year * 12 + (month - 1)")
+    blocked_days = models.IntegerField(
+        default=0,
+        help_text="Nights held by pending/approved bookings or unavailable periods."
+    )
+    open_days = models.IntegerField(
+        default=0,
+        help_text="Nights covered by an available ApartmentAvailability period."
+    )
+
+    class Meta:
+        unique_together = ('apartment', 'month')
+        indexes = [
+            models.Index(fields=['month', 'apartment']),
+        ]
+
+    def __str__(self):
+        return f"{self.apartment_id} @ {self.month}"
@@ -0,0 +1,220 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Apartment
+
+
+def estimate_count(queryset):
+    """Planner row estimate for `queryset`, or None when the backend has none."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Admin paginator that uses the planner estimate for large results.
+
+    Results estimated below `exact_count_threshold` rows are counted
+    exactly; above it the page count is approximate, which the admin
+    tolerates (pages past the real end are simply empty).
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < self.exact_count_threshold:
+            return super().count
+        return estimate
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class SearchCursorPagination(BasePagination):
+    """Keyset pagination over (ordering field, id).
+
+    Unlike DRF's CursorPagination, ties on the ordering field are broken by
+    the primary key inside the WHERE clause, so deep pages stay an index
+    range scan even for low-cardinality fields such as price.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_cap = 1000
+    ordering_query_param = 'ordering'
+    ordering_fields = ['price_per_month', 'size_sqm', 'created_at']
+    # distance_km is annotated by the search view when lat/lng are given.
+    ordering_aliases = {'recommended': '-ranking_score', 'distance': 'distance_km'}
+    default_ordering = '-created_at'
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering in self.ordering_aliases:
+            return self.ordering_aliases[ordering]
+        if ordering and ordering.lstrip('-') in self.ordering_fields:
+            return ordering
+        return self.default_ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def cursor_value(self, model, value):
+        """Convert a decoded cursor value to the ordering field's type."""
+        try:
+            field = model._meta.get_field(self.field)
+        except FieldDoesNotExist:
+            field = FloatField()  # annotated orderings such as distance_km
+        value = field.to_python(value)
+        if value is None or (isinstance(value, datetime) and timezone.is_naive(value)):
+            raise ValueError(value)
+        return value
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return self.cursor_value(model, cursor['v']), int(cursor['id']), bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, obj, reverse):
+        payload = {
+            'v': _encode_value(getattr(obj, self.field)),
+            'id': obj.pk,
+            'r': reverse,
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def start(self, request, model):
+        """Read page size, ordering and cursor; returns (cursor, scan_descending)."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(request)
+        self.field = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+
+        cursor = self.decode_cursor(request, model)
+        reverse = bool(cursor and cursor[2])
+        # Walking backwards flips the direction, results are flipped back below.
+        return cursor, descending != reverse
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor, scan_descending = self.start(request, queryset.model)
+        self.total, self.count_is_exact = self.get_count(queryset, request)
+
+        prefix = '-' if scan_descending else ''
+        queryset = queryset.order_by(prefix + self.field, prefix + 'pk')
+
+        if cursor:
+            value, pk, _ = cursor
+            op = 'lt' if scan_descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{op}': value}) |
+                Q(**{self.field: value, f'pk__{op}': pk})
+            )
+
+        return self.finish(list(queryset[:self.page_size + 1]), cursor)
+
+    def paginate_selection(self, selection, hydrate, request):
+        """Page through a catalog snapshot Selection.
+
+        Only the IDs of the page are passed to `hydrate`, which loads them
+        in the given order.
+        """
+        cursor, scan_descending = self.start(request, Apartment)
+        self.total, self.count_is_exact = self.get_selection_count(selection, request)
+        ids = selection.keyset(self.field, scan_descending, cursor, self.page_size + 1)
+        return self.finish(hydrate(ids), cursor)
+
+    def finish(self, rows, cursor):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if cursor and cursor[2]:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param, 'capped')
+        if mode == 'none':
+            return None, False
+        if mode == 'exact':
+            return queryset.count(), True
+        if mode == 'estimate':
+            estimate = estimate_count(queryset)
+            if estimate is not None:
+                return estimate, False
+        capped = queryset.order_by()[:self.count_cap + 1].count()
+        return min(capped, self.count_cap), capped <= self.count_cap
+
+    def get_selection_count(self, selection, request):
+        mode = request.query_params.get(self.count_query_param, 'capped')
+        if mode == 'none':
+            return None, False
+        total = selection.count()
+        if mode == 'capped':
+            return min(total, self.count_cap), total <= self.count_cap
+        return total, True
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.total,
+            'count_is_exact': self.count_is_exact,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
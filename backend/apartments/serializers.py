@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Apartment, ApartmentImage, Amenity
-from favorites.models import Favorite
+from .services import favorite_ids
 
 
 class AmenitySerializer(serializers.ModelSerializer):
@@ -17,13 +17,35 @@ class ApartmentImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image', 'is_primary']
 
 
-class ApartmentSearchSerializer(serializers.ModelSerializer):
+class ListingRelationsMixin:
+    """Primary image and favorite flag resolved without per-row queries.
+
+    Expects apartments loaded with Apartment.objects.for_listing() so images
+    are prefetched; the user's favorite IDs come from the per-user cache in
+    services/favorite_ids.py, once per serializer tree.
+    """
+
+    def get_primary_image(self, obj):
+        primary_image = next((image for image in obj.images.all() if image.is_primary), None)
+        if primary_image:
+            return ApartmentImageSerializer(primary_image).data
+        return None
+
+    def get_is_favorited(self, obj):
+        if 'favorite_ids' not in self.context:
+            request = self.context.get('request')
+            self.context['favorite_ids'] = favorite_ids.for_user(getattr(request, 'user', None))
+        return obj.pk in self.context['favorite_ids']
+
+
+class ApartmentSearchSerializer(ListingRelationsMixin, serializers.ModelSerializer):
     images = ApartmentImageSerializer(many=True, read_only=True)
     amenities = AmenitySerializer(many=True, read_only=True)
     primary_image = serializers.SerializerMethodField()
-    annotated_rating = serializers.FloatField(read_only=True)
-    review_count = serializers.IntegerField(read_only=True)
+    annotated_rating = serializers.FloatField(source='average_rating', read_only=True)
     is_favorited = serializers.SerializerMethodField()
+    # Only present on geographic searches.
+    distance_km = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Apartment
@@ -31,28 +53,15 @@ class ApartmentSearchSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'address', 'city', 'country',
             'price_per_month', 'bedrooms', 'bathrooms', 'size_sqm',
             'is_available', 'images', 'amenities', 'primary_image',
-            'annotated_rating', 'review_count', 'is_favorited'
+            'annotated_rating', 'review_count', 'is_favorited', 'distance_km'
         ]
 
-    def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
-            return ApartmentImageSerializer(primary_image).data
-        return None
-
-    def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if user and user.is_authenticated:
-            return Favorite.objects.filter(user=user, apartment=obj).exists()
-        return False
-
 
-class ApartmentDetailSerializer(serializers.ModelSerializer):
+class ApartmentDetailSerializer(ListingRelationsMixin, serializers.ModelSerializer):
     images = ApartmentImageSerializer(many=True, read_only=True)
     amenities = AmenitySerializer(many=True, read_only=True)
     primary_image = serializers.SerializerMethodField()
-    average_rating = serializers.FloatField(source='annotated_rating', read_only=True)
-    review_count = serializers.IntegerField(read_only=True)
+    rating_counts = serializers.DictField(child=serializers.IntegerField(), read_only=True)
     owner_name = serializers.CharField(source='owner.first_name', read_only=True)
     owner_image = serializers.ImageField(source='owner.profile.image', read_only=True, allow_null=True)
     property_type = serializers.CharField(source='property_type.name', read_only=True)
@@ -66,23 +75,12 @@ class ApartmentDetailSerializer(serializers.ModelSerializer):
             'price_per_month', 'bedrooms', 'bathrooms', 'size_sqm',
             'is_available', 'property_type',
             'images', 'primary_image', 'amenities',
-            'average_rating', 'review_count',
+            'average_rating', 'review_count', 'rating_counts',
             'owner_name', 'owner_image', 'is_favorited'
         ]
 
-    def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
-            return ApartmentImageSerializer(primary_image).data
-        return None
 
-    def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if user and user.is_authenticated:
-            return Favorite.objects.filter(user=user, apartment=obj).exists()
-        return False
-        
 class ApartmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Apartment
-        fields = '__all__'
+        exclude = ['search_vector', 'amenity_mask']
@@ -0,0 +1,81 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import F, Q
+from django.utils import timezone
+from django.db.models.lookups import Exact
+
+from apartments.models import Amenity, Apartment
+
+# Apartment.amenity_mask mirrors the Amenity.apartments M2M table as a bitmask
+# of Amenity.bit, so "has all of these amenities" is one predicate on the
+# apartment row instead of one join per amenity.
+
+
+def masks_for(apartment_ids):
+    """Compute the amenity masks of the given apartments from the M2M table."""
+    masks = dict.fromkeys(apartment_ids, 0)
+    links = Amenity.apartments.through.objects.filter(
+        apartment_id__in=apartment_ids,
+        amenity__bit__isnull=False
+    ).values_list('apartment_id', 'amenity__bit')
+    for apartment_id, bit in links:
+        masks[apartment_id] |= 1 << bit
+    return masks
+
+
+def _write(masks):
+    by_mask = defaultdict(list)
+    for apartment_id, mask in masks.items():
+        by_mask[mask].append(apartment_id)
+    now = timezone.now()  # lets the catalog snapshot pick up the change
+    for mask, apartment_ids in by_mask.items():
+        Apartment.objects.filter(id__in=apartment_ids).update(amenity_mask=mask, updated_at=now)
+
+
+def refresh(apartment_ids):
+    apartment_ids = list(apartment_ids)
+    if apartment_ids:
+        _write(masks_for(apartment_ids))
+
+
+def rebuild(batch_size=2000):
+    apartment_ids = Apartment.objects.order_by('id').values_list('id', flat=True)
+    batch = []
+    for apartment_id in apartment_ids.iterator(chunk_size=batch_size):
+        batch.append(apartment_id)
+        if len(batch) >= batch_size:
+            refresh(batch)
+            batch = []
+    refresh(batch)
+
+
+def filter_has_all(queryset, names):
+    """Keep apartments that have an amenity named (case-insensitively) each of `names`."""
+    names = {name.strip().lower() for name in names if name.strip()}
+    if not names:
+        return queryset
+
+    matches = defaultdict(list)
+    amenities = Amenity.objects.filter(reduce(or_, (Q(name__iexact=name) for name in names)))
+    for name, bit in amenities.values_list('name', 'bit'):
+        matches[name.lower()].append(bit)
+
+    mask = 0
+    for name in names:
+        bits = matches.get(name)
+        if not bits:
+            return queryset.none()
+        if len(bits) == 1 and bits[0] is not None:
+            mask |= 1 << bits[0]
+        else:
+            # Duplicate names (any of them qualifies) and amenities beyond
+            # the last bit go through the M2M table.
+            queryset = queryset.filter(id__in=Amenity.apartments.through.objects.filter(
+                amenity__name__iexact=name
+            ).values('apartment_id'))
+
+    if mask:
+        queryset = queryset.filter(Exact(F('amenity_mask').bitand(mask), mask))
+    return queryset
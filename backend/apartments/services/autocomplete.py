@@ -0,0 +1,125 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from apartments.models import Apartment
+
+GENERATION_KEY = 'autocomplete:locations:generation'
+# How often a worker checks whether another worker changed the locations.
+SYNC_INTERVAL = 5.0
+# Rebuilt from the table at least this often, so a missed generation bump
+# (such as a queryset.update() that fires no signal) cannot linger.
+MAX_AGE = 300.0
+
+
+def _tokens(city, country):
+    """Lower-cased strings a prefix can match: each name and every word start."""
+    tokens = set()
+    for name in (city, country):
+        words = name.lower().split()
+        for start in range(len(words)):
+            tokens.add(' '.join(words[start:]))
+    return tokens
+
+
+class LocationIndex:
+    """Sorted prefix index of distinct (city, country) pairs, per worker.
+
+    Built from one GROUP BY when the worker starts (see config/wsgi.py), then
+    kept current by the Apartment signals of this worker. Changes made by
+    other workers are picked up through a generation counter in the shared
+    cache, and the whole index is rebuilt every MAX_AGE seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._keys = []
+        self._generation = None
+        self._checked_at = 0.0
+        self._built_at = 0.0
+
+    def _rebuild(self):
+        generation = cache.get(GENERATION_KEY, 0)
+        rows = (
+            Apartment.objects
+            .order_by()
+            .values_list('city', 'country')
+            .annotate(listings=Count('id'))
+        )
+        counts = {(city, country): listings for city, country, listings in rows}
+        keys = sorted(
+            (token, city, country)
+            for city, country in counts
+            for token in _tokens(city, country)
+        )
+        self._counts, self._keys = counts, keys
+        self._generation = generation
+        self._checked_at = self._built_at = time.monotonic()
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._generation is not None and now - self._checked_at < SYNC_INTERVAL:
+            return
+        self._checked_at = now
+        if (
+            self._generation is None or
+            now - self._built_at >= MAX_AGE or
+            cache.get(GENERATION_KEY, 0) != self._generation
+        ):
+            self._rebuild()
+
+    def warm(self):
+        """Build the index now rather than on the first query."""
+        with self._lock:
+            self._rebuild()
+
+    def suggest(self, prefix, limit=5):
+        prefix = prefix.strip().lower()
+        with self._lock:
+            self._sync()
+            pairs = set()
+            for token, city, country in self._keys[bisect_left(self._keys, (prefix,)):]:
+                if not token.startswith(prefix):
+                    break
+                pairs.add((city, country))
+            best = heapq.nlargest(limit, pairs, key=lambda pair: (self._counts[pair], pair))
+            return [(city, country, self._counts[(city, country)]) for city, country in best]
+
+    def adjust(self, city, country, delta):
+        """Apply a listing count change made by this worker."""
+        try:
+            generation = cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.add(GENERATION_KEY, 0, timeout=None)
+            generation = cache.incr(GENERATION_KEY)
+
+        with self._lock:
+            if self._generation is None:
+                return  # not built yet, the first query loads fresh data
+            if generation != self._generation + 1:
+                # Another worker changed locations too, reload on next query.
+                self._generation = None
+                return
+            self._generation = generation
+
+            pair = (city, country)
+            count = self._counts.get(pair, 0) + delta
+            if count > 0 and pair in self._counts:
+                self._counts[pair] = count
+            elif count > 0:
+                self._counts[pair] = count
+                for token in _tokens(city, country):
+                    insort(self._keys, (token, city, country))
+            elif pair in self._counts:
+                del self._counts[pair]
+                for token in _tokens(city, country):
+                    index = bisect_left(self._keys, (token, city, country))
+                    del self._keys[index]
+
+
+location_index = LocationIndex()
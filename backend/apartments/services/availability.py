@@ -0,0 +1,323 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, Count, F, Q, Value
+from django.db.models.lookups import Exact, GreaterThan
+from django.utils import timezone
+
+from apartments.models import Apartment, ApartmentAvailability, AvailabilityMonth
+from apartments.services import search_cache
+from bookings.models import Booking
+
+# Months (starting with the current one) that queries read from
+# AvailabilityMonth. Queries reaching past the horizon fall back to the
+# Booking/ApartmentAvailability tables.
+HORIZON_MONTHS = 18
+# Writers keep one month more than queries read. The month that enters the
+# horizon at a month boundary is then already built, however late in the
+# day the rebuild that rolls the horizon forward runs.
+BUILT_MONTHS = HORIZON_MONTHS + 1
+
+BLOCKING_STATUSES = ['approved', 'pending']
+
+CALENDAR_KEY_PREFIX = 'calendar'
+
+
+def month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def month_start(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def horizon(today=None, months=HORIZON_MONTHS):
+    """Return the [first, last) month indexes currently covered."""
+    first = month_index(today or timezone.localdate())
+    return first, first + months
+
+
+def night_masks(start, end):
+    """Map each month touched by the nights [start, end) to its day bitmask.
+
+    Bit `n - 1` of a month's mask stands for the night starting on day `n`.
+    """
+    masks = {}
+    day = start
+    while day < end:
+        month = month_index(day)
+        next_month = month_start(month + 1)
+        last = min(end, next_month)
+        mask = ((1 << (last - day).days) - 1) << (day.day - 1)
+        masks[month] = masks.get(month, 0) | mask
+        day = last
+    return masks
+
+
+def _in_horizon(check_in, check_out, today=None):
+    first, last = horizon(today)
+    return first <= month_index(check_in) and month_index(check_out - timedelta(days=1)) < last
+
+
+def _build_masks(bookings, periods, first, last):
+    """Fold booking and availability ranges into {(apartment_id, month): [blocked, open]}."""
+    masks = {}
+
+    def fold(apartment_id, start, end, slot):
+        for month, mask in night_masks(start, end).items():
+            if first <= month < last:
+                masks.setdefault((apartment_id, month), [0, 0])[slot] |= mask
+
+    for apartment_id, start, end in bookings:
+        fold(apartment_id, start, end, 0)
+    for apartment_id, start, end, is_available in periods:
+        # Availability periods are inclusive of their end date.
+        fold(apartment_id, start, end + timedelta(days=1), 1 if is_available else 0)
+    return masks
+
+
+def _write_masks(apartment_ids, masks, months):
+    AvailabilityMonth.objects.filter(
+        apartment_id__in=apartment_ids,
+        month__in=months
+    ).delete()
+    AvailabilityMonth.objects.bulk_create([
+        AvailabilityMonth(
+            apartment_id=apartment_id,
+            month=month,
+            blocked_days=blocked,
+            open_days=open_
+        )
+        for (apartment_id, month), (blocked, open_) in masks.items()
+        if blocked or open_
+    ])
+
+
+def _lock(apartment_ids):
+    """Lock the apartment rows whose months are about to be rewritten.
+
+    Writers of one apartment queue here, so each recomputes its masks from
+    the bookings the previous writer committed and the delete + insert
+    pairs never interleave. NO KEY UPDATE does not conflict with the
+    key-share locks held by transactions inserting bookings for the row.
+    """
+    list(
+        Apartment.objects.select_for_update(no_key=True)
+        .filter(id__in=apartment_ids)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+
+
+def _source_rows(apartment_ids, range_start, range_end):
+    bookings = Booking.objects.filter(
+        apartment_id__in=apartment_ids,
+        status__in=BLOCKING_STATUSES,
+        start_date__lt=range_end,
+        end_date__gt=range_start
+    ).values_list('apartment_id', 'start_date', 'end_date')
+    periods = ApartmentAvailability.objects.filter(
+        apartment_id__in=apartment_ids,
+        start_date__lt=range_end,
+        end_date__gte=range_start
+    ).values_list('apartment_id', 'start_date', 'end_date', 'is_available')
+    return bookings, periods
+
+
+def refresh(apartment_id, start, end):
+    """Recompute the months of one apartment touched by [start, end].
+
+    Called whenever a Booking or ApartmentAvailability row changes, so only
+    the affected months of a single apartment are rewritten.
+    """
+    invalidate_calendar(apartment_id, start, end)
+    first, last = horizon(months=BUILT_MONTHS)
+    months = [
+        month for month in range(month_index(start), month_index(end) + 1)
+        if first <= month < last
+    ]
+    if not months:
+        return
+
+    range_start = month_start(months[0])
+    range_end = month_start(months[-1] + 1)
+    with transaction.atomic():
+        _lock([apartment_id])
+        bookings, periods = _source_rows([apartment_id], range_start, range_end)
+        masks = _build_masks(bookings, periods, months[0], months[-1] + 1)
+        _write_masks([apartment_id], masks, months)
+
+
+def refresh_bookings(ranges):
+    """Refresh the months of bookings changed through queryset.update().
+
+    `ranges` are (apartment_id, start_date, end_date) tuples, read before the
+    update since it may move the bookings out of the updated queryset.
+    """
+    apartment_ids = set()
+    for apartment_id, start, end in ranges:
+        refresh(apartment_id, start, end)
+        apartment_ids.add(apartment_id)
+    search_cache.invalidate_apartments(apartment_ids)
+
+
+def rebuild(batch_size=1000, today=None):
+    """Rebuild every apartment's bitmaps and roll the horizon forward."""
+    first, last = horizon(today, BUILT_MONTHS)
+    AvailabilityMonth.objects.exclude(month__gte=first, month__lt=last).delete()
+
+    apartment_ids = Apartment.objects.order_by('id').values_list('id', flat=True)
+    batch = []
+    for apartment_id in apartment_ids.iterator(chunk_size=batch_size):
+        batch.append(apartment_id)
+        if len(batch) >= batch_size:
+            _rebuild_batch(batch, first, last)
+            batch = []
+    if batch:
+        _rebuild_batch(batch, first, last)
+
+
+def _rebuild_batch(apartment_ids, first, last):
+    with transaction.atomic():
+        _lock(apartment_ids)
+        bookings, periods = _source_rows(apartment_ids, month_start(first), month_start(last))
+        _write_masks(apartment_ids, _build_masks(bookings, periods, first, last), range(first, last))
+
+
+def exclude_booked(queryset, check_in, check_out):
+    """Drop apartments with a blocking booking or blocked period in [check_in, check_out)."""
+    if not _in_horizon(check_in, check_out):
+        booked = Booking.objects.filter(
+            status__in=BLOCKING_STATUSES,
+            start_date__lt=check_out,
+            end_date__gt=check_in
+        ).values('apartment_id')
+        closed = ApartmentAvailability.objects.filter(
+            is_available=False,
+            start_date__lt=check_out,
+            end_date__gte=check_in
+        ).values('apartment_id')
+        return queryset.exclude(id__in=booked).exclude(id__in=closed)
+
+    clash = Q()
+    for month, mask in night_masks(check_in, check_out).items():
+        clash |= Q(month=month) & GreaterThan(F('blocked_days').bitand(mask), 0)
+    blocked = AvailabilityMonth.objects.filter(clash).values('apartment_id')
+    return queryset.exclude(id__in=blocked)
+
+
+def filter_open(queryset, check_in, check_out):
+    """Keep apartments whose availability periods cover every night and that are not booked."""
+    if not _in_horizon(check_in, check_out):
+        covered = ApartmentAvailability.objects.filter(
+            start_date__lte=check_in,
+            end_date__gte=check_out,
+            is_available=True
+        ).values('apartment_id')
+        return exclude_booked(queryset.filter(id__in=covered), check_in, check_out)
+
+    masks = night_masks(check_in, check_out)
+    fits = Q()
+    for month, mask in masks.items():
+        fits |= (
+            Q(month=month) &
+            Exact(F('open_days').bitand(mask), mask) &
+            Exact(F('blocked_days').bitand(mask), 0)
+        )
+    covered = (
+        AvailabilityMonth.objects
+        .filter(fits)
+        .values('apartment_id')
+        .annotate(months=Count('id'))
+        .filter(months=len(masks))
+        .values('apartment_id')
+    )
+    return queryset.filter(id__in=covered)
+
+
+def _calendar_key(apartment_id, month):
+    return f'{CALENDAR_KEY_PREFIX}:{apartment_id}:{month}'
+
+
+def invalidate_calendar(apartment_id, start, end):
+    """Drop the cached months once the current transaction commits.
+
+    Dropping them earlier would let a concurrent request cache them again
+    from the rows this transaction is about to replace.
+    """
+    keys = [
+        _calendar_key(apartment_id, month)
+        for month in range(month_index(start), month_index(end) + 1)
+    ]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def merge_intervals(intervals):
+    """Merge half-open (start, end) date ranges that overlap or touch."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _unavailable_by_month(apartment_id, first, last):
+    """Merged unavailable nights of months [first, last), from one query."""
+    range_start, range_end = month_start(first), month_start(last)
+    bookings = Booking.objects.filter(
+        apartment_id=apartment_id,
+        status__in=BLOCKING_STATUSES,
+        start_date__lt=range_end,
+        end_date__gt=range_start
+    ).annotate(kind=Value('booking', output_field=CharField())).order_by().values_list('start_date', 'end_date', 'kind')
+    blocks = ApartmentAvailability.objects.filter(
+        apartment_id=apartment_id,
+        is_available=False,
+        start_date__lt=range_end,
+        end_date__gte=range_start
+    ).annotate(kind=Value('block', output_field=CharField())).order_by().values_list('start_date', 'end_date', 'kind')
+
+    intervals = []
+    for start, end, kind in bookings.union(blocks, all=True):
+        if kind == 'block':
+            end += timedelta(days=1)  # availability periods include their end date
+        intervals.append((max(start, range_start), min(end, range_end)))
+
+    by_month = {month: [] for month in range(first, last)}
+    for start, end in merge_intervals(intervals):
+        month = month_index(start)
+        while start < end:
+            month_end = min(end, month_start(month + 1))
+            by_month[month].append((start, month_end))
+            start, month = month_end, month + 1
+    return by_month
+
+
+def unavailable_intervals(apartment_id, first, last):
+    """Merged half-open ranges of unavailable nights in months [first, last).
+
+    Each month is cached separately; months missing from the cache are
+    loaded together and cached until a booking or availability period
+    touching them changes.
+    """
+    keys = {month: _calendar_key(apartment_id, month) for month in range(first, last)}
+    found = cache.get_many(keys.values())
+    missing = [month for month, key in keys.items() if key not in found]
+
+    months = {month: found[key] for month, key in keys.items() if key in found}
+    if missing:
+        loaded = _unavailable_by_month(apartment_id, missing[0], missing[-1] + 1)
+        cache.set_many(
+            {keys[month]: loaded[month] for month in missing},
+            timeout=getattr(settings, 'CALENDAR_CACHE_TIMEOUT', 86400)
+        )
+        months.update((month, loaded[month]) for month in missing)
+
+    return merge_intervals(
+        interval for month in range(first, last) for interval in months[month]
+    )
@@ -0,0 +1,251 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+
+from apartments.models import Amenity, Apartment, PropertyType
+
+try:
+    import numpy as np
+except ImportError:  # optional, searches stay on the ORM path without it
+    np = None
+
+# A per-worker copy of the filterable Apartment columns as NumPy arrays,
+# sorted by id. Supported searches are evaluated as vectorized masks and
+# only the IDs of the requested page are loaded from the database.
+#
+# The copy is refreshed from updated_at every SYNC_INTERVAL seconds, so it
+# lags writes by that much. Code that changes a filtered column through
+# queryset.update() must set updated_at too. A sync that finds no row newer
+# than the copy changes nothing. Deleted rows are noticed when a sync with
+# changes finds the row count off, and a full reload every
+# FULL_RELOAD_INTERVAL picks up anything else (such as ranking_score
+# changes); until then a deleted row is simply missing from its page.
+#
+# Syncs replace the column arrays and lookup dicts, never modify them, so
+# searches take references under the lock and evaluate without it.
+
+SYNC_INTERVAL = 5.0
+FULL_RELOAD_INTERVAL = 600.0
+# Rows saved by transactions that commit late carry an older updated_at.
+SYNC_OVERLAP = timedelta(minutes=1)
+
+NUMERIC_COLUMNS = {
+    'price_per_month': 'float64',
+    'bedrooms': 'int32',
+    'bathrooms': 'int32',
+    'size_sqm': 'int32',
+    'max_guests': 'int32',
+    'property_type_id': 'int64',
+    'amenity_mask': 'int64',
+    'ranking_score': 'float64',
+    'is_available': 'bool',
+    'latitude': 'float64',  # NaN when unknown
+    'longitude': 'float64',
+}
+TEXT_COLUMNS = ('city', 'country', 'address')
+ORDERING_FIELDS = ('price_per_month', 'size_sqm', 'created_at', 'ranking_score')
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def enabled():
+    return np is not None and getattr(settings, 'SEARCH_SNAPSHOT_ENABLED', False)
+
+
+def _micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+class CatalogSnapshot:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns = None
+        self._property_types = {}
+        self._amenity_bits = {}
+        self._watermark = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+
+    def _fetch(self, queryset):
+        fields = ['id', *NUMERIC_COLUMNS, *TEXT_COLUMNS, 'created_at', 'updated_at']
+        rows = list(queryset.order_by('id').values_list(*fields))
+        columns = {}
+        for position, name in enumerate(fields[:1 + len(NUMERIC_COLUMNS)]):
+            dtype = 'int64' if name == 'id' else NUMERIC_COLUMNS[name]
+            missing = np.nan if dtype == 'float64' else 0
+            columns[name] = np.array(
+                [missing if row[position] is None else row[position] for row in rows], dtype=dtype
+            )
+        text_start = 1 + len(NUMERIC_COLUMNS)
+        # One lower-cased string per row; the separator keeps a location from
+        # matching across two fields. Held as Python strings: a fixed-width
+        # unicode array would pad every row to the longest address.
+        columns['location'] = np.array(
+            ['\0'.join(row[text_start:text_start + len(TEXT_COLUMNS)]).lower() for row in rows],
+            dtype=object
+        )
+        columns['created_at'] = np.array([_micros(row[-2]) for row in rows], dtype='int64')
+        columns['updated_at'] = np.array([_micros(row[-1]) for row in rows], dtype='int64')
+        watermark = max((row[-1] for row in rows), default=None)
+        return columns, watermark
+
+    def _load_lookups(self):
+        property_types = {}
+        for pk, name in PropertyType.objects.values_list('id', 'name'):
+            property_types.setdefault(name.lower(), []).append(pk)
+        amenity_bits = {}
+        for name, bit in Amenity.objects.values_list('name', 'bit'):
+            amenity_bits.setdefault(name.lower(), []).append(bit)
+        self._property_types, self._amenity_bits = property_types, amenity_bits
+
+    def _reload(self):
+        self._columns, self._watermark = self._fetch(Apartment.objects.all())
+        self._load_lookups()
+        self._loaded_at = self._checked_at = time.monotonic()
+
+    def _newer(self, changed):
+        """The fetched rows that are new or were saved after the stored copy."""
+        ids = self._columns['id']
+        positions = np.searchsorted(ids, changed['id'])
+        known = positions < len(ids)
+        known[known] = ids[positions[known]] == changed['id'][known]
+        newer = ~known
+        newer[known] = changed['updated_at'][known] > self._columns['updated_at'][positions[known]]
+        return {name: values[newer] for name, values in changed.items()}
+
+    def _upsert(self, changed):
+        # Columns are replaced, never written in place, so a Selection made
+        # earlier keeps a consistent view.
+        keep = ~np.isin(self._columns['id'], changed['id'])
+        merged = {
+            name: np.concatenate([self._columns[name][keep], values])
+            for name, values in changed.items()
+        }
+        order = np.argsort(merged['id'], kind='stable')
+        self._columns = {name: values[order] for name, values in merged.items()}
+
+    def _drop_deleted(self):
+        live = np.fromiter(Apartment.objects.values_list('id', flat=True), dtype='int64')
+        keep = np.isin(self._columns['id'], live)
+        self._columns = {name: values[keep] for name, values in self._columns.items()}
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._columns is None or now - self._loaded_at >= FULL_RELOAD_INTERVAL:
+            self._reload()
+            return
+        if now - self._checked_at < SYNC_INTERVAL:
+            return
+        self._checked_at = now
+
+        queryset = Apartment.objects.all()
+        if self._watermark is not None:
+            queryset = queryset.filter(updated_at__gte=self._watermark - SYNC_OVERLAP)
+        changed, watermark = self._fetch(queryset)
+        # The overlap always re-reads rows the copy already holds.
+        changed = self._newer(changed)
+        if not len(changed['id']):
+            return
+        self._upsert(changed)
+        self._watermark = max(filter(None, (self._watermark, watermark)))
+        if Apartment.objects.count() != len(self._columns['id']):
+            self._drop_deleted()
+        self._load_lookups()
+
+    def _current(self):
+        with self._lock:
+            self._sync()
+            return self._columns, self._property_types, self._amenity_bits
+
+    def columns(self):
+        """The current columns, a dict of arrays sorted by id. Treat as read-only."""
+        return self._current()[0]
+
+    def select(self, query):
+        """Return the Selection matching a ListingQuery, or None when a
+        property type or amenity name cannot be resolved here.
+
+        search_engine.SnapshotBackend only sends queries without text,
+        dates, coordinates or photo filters.
+        """
+        columns, property_types, amenity_bits = self._current()
+        mask = columns['is_available'].copy()
+
+        location = query.location.lower()
+        if location:
+            rows = np.flatnonzero(mask)
+            mask[rows] = np.fromiter(
+                (location in text for text in columns['location'][rows]), dtype=bool, count=len(rows)
+            )
+
+        bounds = (
+            (query.guests, 'max_guests', np.greater_equal),
+            (query.bedrooms, 'bedrooms', np.greater_equal),
+            (query.bathrooms, 'bathrooms', np.greater_equal),
+            (query.min_size, 'size_sqm', np.greater_equal),
+            (query.max_size, 'size_sqm', np.less_equal),
+            (query.min_price, 'price_per_month', np.greater_equal),
+            (query.max_price, 'price_per_month', np.less_equal),
+        )
+        for value, column, compare in bounds:
+            if value is not None:
+                mask &= compare(columns[column], value)
+
+        if query.property_type:
+            type_ids = property_types.get(query.property_type.lower())
+            if not type_ids:
+                return None
+            mask &= np.isin(columns['property_type_id'], type_ids)
+
+        required = 0
+        for name in {name.lower() for name in query.amenities}:
+            bits = amenity_bits.get(name)
+            if not bits or len(bits) > 1 or bits[0] is None:
+                return None
+            required |= 1 << bits[0]
+        if required:
+            mask &= (columns['amenity_mask'] & required) == required
+
+        return Selection(columns, mask)
+
+
+class Selection:
+    """Rows of one snapshot version picked out by a boolean mask."""
+
+    def __init__(self, columns, mask):
+        self.columns = columns
+        self.mask = mask
+
+    def count(self):
+        return int(self.mask.sum())
+
+    def keyset(self, field, descending, cursor, limit):
+        """IDs of up to `limit` selected rows after `cursor`, ordered by (field, id)."""
+        ids = self.columns['id']
+        values = self.columns[field]
+        mask = self.mask
+        if cursor:
+            value, pk, _ = cursor
+            value = _micros(value) if field == 'created_at' else float(value)
+            if descending:
+                mask = mask & ((values < value) | ((values == value) & (ids < pk)))
+            else:
+                mask = mask & ((values > value) | ((values == value) & (ids > pk)))
+        rows = np.flatnonzero(mask)
+        keys, tie_breaks = values[rows], ids[rows]
+        if descending:
+            keys, tie_breaks = -keys, -tie_breaks
+        if len(rows) > limit:
+            # Only the first `limit` rows are needed: keep the rows up to the
+            # limit-th smallest key (ties included) and sort just those.
+            cut = np.partition(keys, limit - 1)[limit - 1]
+            near = keys <= cut
+            rows, keys, tie_breaks = rows[near], keys[near], tie_breaks[near]
+        order = np.lexsort((tie_breaks, keys))[:limit]
+        return ids[rows[order]].tolist()
+
+
+catalog_snapshot = CatalogSnapshot()
@@ -0,0 +1,261 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from apartments.models import Apartment
+from apartments.services import ranking
+from bookings.models import Booking
+from favorites.models import Favorite
+
+# Write-behind counters for Apartment.views_count, favorites_count and
+# bookings_count. increment() only touches the cache; flush() (run every
+# minute by run_scheduled_jobs) moves the buffered deltas into the table with
+# one UPDATE per batch, so a popular listing's row is not rewritten on every
+# view or click.
+#
+# The buffer is the cache named by settings.COUNTERS_CACHE. It has to be
+# shared by every process and its incr() atomic, which holds for Redis but
+# not for the database cache (read, then write) or locmem (per process).
+#
+# Without COUNTERS_CACHE, views are summed in process by LocalBuffer and
+# written by the first increment that finds the sums LOCAL_FLUSH_INTERVAL
+# old, with one UPDATE for every apartment viewed since; a worker that
+# exits loses at most that much. Favorite and booking counts are written
+# straight through, inside the transaction that changes them.
+#
+# Each buffered delta lives under its own key and is adjusted with
+# cache.incr(), so deltas may be negative (unfavorite). A delta key is
+# registered as dirty when an increment takes it away from zero. The
+# registry is an append-only run of numbered slots; flush() walks the slots
+# written since its last run and deletes them. After writing a batch it
+# subtracts exactly what it read, and registers the key again if increments
+# arrived in between, so no increment is lost or applied twice.
+#
+# Favorite and booking deltas also move Apartment.ranking_score by
+# ranking.COUNTER_NUDGES in the same UPDATE, so the score needs no write of
+# its own per event.
+#
+# reconcile() recomputes favorites_count and bookings_count from their
+# tables. Views have no source table and are only ever flushed.
+
+FIELDS = ('views_count', 'favorites_count', 'bookings_count')
+
+KEY_PREFIX = 'counter'
+DIRTY_SEQ_KEY = f'{KEY_PREFIX}:dirty:seq'
+FLUSHED_SEQ_KEY = f'{KEY_PREFIX}:dirty:flushed'
+STALLED_SLOT_KEY = f'{KEY_PREFIX}:dirty:stalled'
+FLUSH_LOCK_KEY = f'{KEY_PREFIX}:flush-lock'
+FLUSH_LOCK_TIMEOUT = 300
+
+LOCAL_FIELDS = ('views_count',)
+LOCAL_FLUSH_INTERVAL = 30.0
+
+
+def _buffer():
+    """The cache holding buffered deltas, or None when writes go straight through."""
+    alias = getattr(settings, 'COUNTERS_CACHE', None)
+    return caches[alias] if alias else None
+
+
+class LocalBuffer:
+    """Per-process deltas, used when there is no shared COUNTERS_CACHE."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deltas = {}
+        self._started_at = None
+
+    def add(self, apartment_id, field, delta):
+        now = time.monotonic()
+        with self._lock:
+            key = (apartment_id, field)
+            self._deltas[key] = self._deltas.get(key, 0) + delta
+            if self._started_at is None:
+                self._started_at = now
+            due = now - self._started_at >= LOCAL_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def pending(self, apartment_id):
+        with self._lock:
+            return {field: self._deltas.get((apartment_id, field), 0) for field in FIELDS}
+
+    def flush(self):
+        with self._lock:
+            deltas, self._deltas, self._started_at = self._deltas, {}, None
+        deltas = {pair: delta for pair, delta in deltas.items() if delta}
+        if deltas:
+            _apply(deltas)
+        return len(deltas)
+
+
+local_buffer = LocalBuffer()
+
+
+def _delta_key(apartment_id, field):
+    return f'{KEY_PREFIX}:{field}:{apartment_id}'
+
+
+def _slot_key(slot):
+    return f'{KEY_PREFIX}:dirty:{slot}'
+
+
+def _incr(cache, key, delta):
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:  # evicted between add() and incr()
+        cache.set(key, delta, timeout=None)
+        return delta
+
+
+def _mark_dirty(cache, apartment_id, field):
+    slot = _incr(cache, DIRTY_SEQ_KEY, 1)
+    cache.set(_slot_key(slot), (apartment_id, field), timeout=None)
+
+
+def increment(apartment_id, field, delta=1):
+    """Buffer `delta` for one of FIELDS of an apartment."""
+    cache = _buffer()
+    if cache is None:
+        if field in LOCAL_FIELDS:
+            local_buffer.add(apartment_id, field, delta)
+        else:
+            _apply({(apartment_id, field): delta})
+    elif _incr(cache, _delta_key(apartment_id, field), delta) == delta:
+        _mark_dirty(cache, apartment_id, field)
+
+
+def pending(apartment_id):
+    """Buffered deltas of one apartment, by field."""
+    cache = _buffer()
+    if cache is None:
+        return local_buffer.pending(apartment_id)
+    keys = {field: _delta_key(apartment_id, field) for field in FIELDS}
+    found = cache.get_many(keys.values())
+    return {field: found.get(key, 0) for field, key in keys.items()}
+
+
+def _dirty_since(cache, flushed, last):
+    """Return the (apartment_id, field) pairs in slots (flushed, last] and the
+    last slot read, deleting the slots read.
+
+    A slot is numbered before it is written, so a missing slot may still be
+    in flight; reading stops there. A slot still missing on the next flush
+    was lost and is skipped.
+    """
+    dirty = set()
+    slot = flushed
+    while slot < last:
+        chunk = range(slot + 1, min(slot + 1000, last) + 1)
+        found = cache.get_many([_slot_key(number) for number in chunk])
+        read = []
+        for number in chunk:
+            entry = found.get(_slot_key(number))
+            if entry is None:
+                if cache.get(STALLED_SLOT_KEY) != number:
+                    cache.set(STALLED_SLOT_KEY, number, timeout=None)
+                    break
+            else:
+                dirty.add(tuple(entry))
+                read.append(_slot_key(number))
+            slot = number
+        cache.delete_many(read)
+        if slot < chunk[-1]:
+            break
+    return dirty, slot
+
+
+def _apply(deltas):
+    """Write {(apartment_id, field): delta} with one UPDATE."""
+    updates = {}
+    nudges = {}
+    for (apartment_id, field), delta in deltas.items():
+        if field in ranking.COUNTER_NUDGES:
+            nudges[apartment_id] = nudges.get(apartment_id, 0.0) + delta * ranking.COUNTER_NUDGES[field]
+    for field in FIELDS:
+        whens = [
+            When(id=apartment_id, then=Value(delta))
+            for (apartment_id, name), delta in deltas.items() if name == field
+        ]
+        if whens:
+            change = Case(*whens, default=Value(0), output_field=IntegerField())
+            updates[field] = Greatest(F(field) + change, Value(0))
+    if nudges:
+        whens = [When(id=apartment_id, then=Value(nudge)) for apartment_id, nudge in nudges.items()]
+        updates['ranking_score'] = F('ranking_score') + Case(*whens, default=Value(0.0), output_field=FloatField())
+    Apartment.objects.filter(id__in={apartment_id for apartment_id, _ in deltas}).update(**updates)
+
+
+def flush(batch_size=500):
+    """Write buffered deltas to the table; return how many were applied.
+
+    Returns None when another flush holds the lock. Without COUNTERS_CACHE
+    only this process's LocalBuffer is written.
+    """
+    cache = _buffer()
+    if cache is None:
+        return local_buffer.flush()
+    if not cache.add(FLUSH_LOCK_KEY, 1, timeout=FLUSH_LOCK_TIMEOUT):
+        return None
+    try:
+        flushed = cache.get(FLUSHED_SEQ_KEY, 0)
+        dirty, slot = _dirty_since(cache, flushed, cache.get(DIRTY_SEQ_KEY, 0))
+        dirty = sorted(dirty)
+        applied = 0
+        for start in range(0, len(dirty), batch_size):
+            keys = {pair: _delta_key(*pair) for pair in dirty[start:start + batch_size]}
+            found = cache.get_many(keys.values())
+            deltas = {pair: found[key] for pair, key in keys.items() if found.get(key)}
+            if not deltas:
+                continue
+            with transaction.atomic():
+                _apply(deltas)
+            for pair, delta in deltas.items():
+                if _incr(cache, keys[pair], -delta) != 0:
+                    _mark_dirty(cache, *pair)
+            applied += len(deltas)
+        cache.set(FLUSHED_SEQ_KEY, slot, timeout=None)
+        return applied
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def _total(model):
+    return Coalesce(Subquery(
+        model.objects
+        .filter(apartment=OuterRef('pk'))
+        .order_by()
+        .values('apartment')
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def reconcile(batch_size=1000):
+    """Recompute favorites_count and bookings_count from their tables.
+
+    Pending deltas are flushed first; they are already part of the tables.
+    """
+    flush()
+    apartment_ids = Apartment.objects.order_by('id').values_list('id', flat=True)
+    batch = []
+    for apartment_id in apartment_ids.iterator(chunk_size=batch_size):
+        batch.append(apartment_id)
+        if len(batch) >= batch_size:
+            _reconcile_batch(batch)
+            batch = []
+    if batch:
+        _reconcile_batch(batch)
+
+
+def _reconcile_batch(apartment_ids):
+    Apartment.objects.filter(id__in=apartment_ids).update(
+        favorites_count=_total(Favorite),
+        bookings_count=_total(Booking),
+    )
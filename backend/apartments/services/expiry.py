@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.utils import timezone
+
+from apartments.services import availability
+from bookings.models import Booking
+
+# Pending and approved bookings whose stay has ended become 'completed'.
+# complete_expired() runs from the complete_expired_bookings command on a
+# schedule, so request handlers only read the status. Each batch is picked
+# through the (status, end_date) index and updated in its own transaction.
+
+EXPIRING_STATUSES = ['approved', 'pending']
+
+
+def complete_expired(batch_size=500, today=None):
+    """Mark ended bookings completed; return how many were updated."""
+    today = today or timezone.localdate()
+    expired = Booking.objects.filter(status__in=EXPIRING_STATUSES, end_date__lt=today).order_by()
+    total = 0
+    while True:
+        ranges = list(expired.values_list('id', 'apartment_id', 'start_date', 'end_date')[:batch_size])
+        if not ranges:
+            return total
+        ids = [row[0] for row in ranges]
+        now = timezone.now()
+        with transaction.atomic():
+            # Re-filtered on status so a booking cancelled meanwhile stays cancelled.
+            total += expired.filter(id__in=ids).update(status='completed', completed_at=now, updated_at=now)
+        availability.refresh_bookings(row[1:] for row in ranges)
@@ -0,0 +1,67 @@
+from django.db.models import Count, F, Q
+from django.db.models.lookups import Exact
+
+from apartments.models import Amenity, PropertyType
+
+# Same ranges as the admin's PriceRangeFilter; the last bucket is open-ended.
+PRICE_EDGES = [0, 500, 1000, 2000]
+BEDROOM_BUCKETS = [0, 1, 2, 3, 4]  # the last bucket means "4 or more"
+
+
+def _price_buckets():
+    buckets = []
+    for low, high in zip(PRICE_EDGES, PRICE_EDGES[1:] + [None]):
+        q = Q(price_per_month__gt=low) if low else Q()
+        if high is not None:
+            q &= Q(price_per_month__lte=high)
+        buckets.append((low, high, q))
+    return buckets
+
+
+def compute(queryset):
+    """Count the filtered apartments per facet value in a single aggregate query.
+
+    Property types and indexed amenities are read first (two small lookup
+    tables); every facet count is then a filtered COUNT in one pass over
+    `queryset`.
+    """
+    property_types = list(PropertyType.objects.order_by('name').values_list('id', 'name'))
+    amenities = list(Amenity.objects.filter(bit__isnull=False).values_list('bit', 'name'))
+    price_buckets = _price_buckets()
+
+    aggregates = {}
+    for type_id, _ in property_types:
+        aggregates[f'type_{type_id}'] = Count('id', filter=Q(property_type_id=type_id))
+    for bit, _ in amenities:
+        aggregates[f'amenity_{bit}'] = Count('id', filter=Exact(F('amenity_mask').bitand(1 << bit), 1 << bit))
+    for bedrooms in BEDROOM_BUCKETS:
+        last = bedrooms == BEDROOM_BUCKETS[-1]
+        aggregates[f'bedrooms_{bedrooms}'] = Count(
+            'id', filter=Q(bedrooms__gte=bedrooms) if last else Q(bedrooms=bedrooms)
+        )
+    for index, (_, _, q) in enumerate(price_buckets):
+        aggregates[f'price_{index}'] = Count('id', filter=q)
+
+    totals = queryset.order_by().aggregate(**aggregates)
+
+    return {
+        'property_types': [
+            {'name': name, 'count': totals[f'type_{type_id}']}
+            for type_id, name in property_types
+        ],
+        'amenities': sorted(
+            ({'name': name, 'count': totals[f'amenity_{bit}']} for bit, name in amenities),
+            key=lambda facet: facet['name']
+        ),
+        'bedrooms': [
+            {
+                'bedrooms': f'{bedrooms}+' if bedrooms == BEDROOM_BUCKETS[-1] else str(bedrooms),
+                'count': totals[f'bedrooms_{bedrooms}'],
+            }
+            for bedrooms in BEDROOM_BUCKETS
+        ],
+        'price': [
+            {'min': low, 'max': high, 'count': totals[f'price_{index}']}
+            for index, (low, high, _) in enumerate(price_buckets)
+        ],
+    }
@@ -0,0 +1,123 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils import timezone
+
+from apartments.models import Apartment
+from apartments.services import counters
+from favorites.models import Favorite
+
+# Each user's favorited apartment IDs are cached as one set, so listings
+# answer is_favorited without touching Favorite.
+#
+# The set is stored as (version, ids) beside a per-user version counter.
+# Every change bumps the counter once it is committed (earlier, a reload
+# could store the old rows under the new version); a set whose version is
+# behind is reloaded. A toggle patches the cached set in place only when
+# no other change slipped in since the set was stored, so concurrent
+# toggles can never leave a stale set behind.
+#
+# toggle() is one statement on PostgreSQL (DELETE ... RETURNING feeding a
+# conditional INSERT). That statement bypasses the model signals, so it
+# calls record_change() itself, as the Favorite signals do for every other
+# write.
+
+KEY_PREFIX = 'favorites'
+
+
+def timeout():
+    return getattr(settings, 'FAVORITES_CACHE_TIMEOUT', 86400)
+
+
+def _keys(user_id):
+    return f'{KEY_PREFIX}:{user_id}:ids', f'{KEY_PREFIX}:{user_id}:version'
+
+
+def for_user(user):
+    """The set of apartment IDs `user` has favorited (empty when anonymous)."""
+    if not user or not user.is_authenticated:
+        return set()
+    ids_key, version_key = _keys(user.pk)
+    found = cache.get_many([ids_key, version_key])
+    version = found.get(version_key, 0)
+    cached = found.get(ids_key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    ids = set(Favorite.objects.filter(user_id=user.pk).values_list('apartment_id', flat=True))
+    cache.set(ids_key, (version, ids), timeout=timeout())
+    return ids
+
+
+def _bump(version_key):
+    cache.add(version_key, 0, timeout=None)
+    try:
+        return cache.incr(version_key)
+    except ValueError:  # evicted between add() and incr()
+        cache.set(version_key, 1, timeout=None)
+        return 1
+
+
+def record_change(user_id, apartment_id, added):
+    """Apply the side effects of a favorite being added or removed."""
+    counters.increment(apartment_id, 'favorites_count', 1 if added else -1)
+    transaction.on_commit(partial(_patch, user_id, apartment_id, added))
+
+
+def _patch(user_id, apartment_id, added):
+    ids_key, version_key = _keys(user_id)
+    version = _bump(version_key)
+    cached = cache.get(ids_key)
+    if cached is not None and cached[0] == version - 1:
+        ids = set(cached[1])
+        if added:
+            ids.add(apartment_id)
+        else:
+            ids.discard(apartment_id)
+        cache.set(ids_key, (version, ids), timeout=timeout())
+
+
+TOGGLE_SQL = """
+    WITH removed AS (
+        DELETE FROM favorites_favorite
+        WHERE user_id = %(user_id)s AND apartment_id = %(apartment_id)s
+        RETURNING 1
+    ), added AS (
+        INSERT INTO favorites_favorite (user_id, apartment_id, created_at)
+        SELECT %(user_id)s, id, %(now)s FROM apartments_apartment
+        WHERE id = %(apartment_id)s AND NOT EXISTS (SELECT 1 FROM removed)
+        ON CONFLICT (user_id, apartment_id) DO NOTHING
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM removed), (SELECT count(*) FROM added)
+"""
+
+
+def toggle(user_id, apartment_id):
+    """Add or remove a favorite; return 'added' or 'removed'.
+
+    Raises Apartment.DoesNotExist when the apartment does not exist.
+    """
+    connection = connections[Favorite.objects.db]
+    if connection.vendor != 'postgresql':
+        with transaction.atomic():
+            deleted, _ = Favorite.objects.filter(user_id=user_id, apartment_id=apartment_id).delete()
+            if deleted:
+                return 'removed'
+            if not Apartment.objects.filter(pk=apartment_id).exists():
+                raise Apartment.DoesNotExist
+            Favorite.objects.get_or_create(user_id=user_id, apartment_id=apartment_id)
+            return 'added'
+
+    with connection.cursor() as cursor:
+        cursor.execute(TOGGLE_SQL, {'user_id': user_id, 'apartment_id': apartment_id, 'now': timezone.now()})
+        removed, added = cursor.fetchone()
+    if removed or added:
+        record_change(user_id, apartment_id, bool(added))
+        return 'added' if added else 'removed'
+    # Nothing changed: the apartment is missing, or a concurrent toggle
+    # inserted the same row first.
+    if not Apartment.objects.filter(pk=apartment_id).exists():
+        raise Apartment.DoesNotExist
+    return 'added'
@@ -0,0 +1,238 @@
+from math import radians, degrees, cos, sin, asin, sqrt
+
+from django.db.models import F, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371
+# Half the circumference: every point on Earth is within this distance.
+MAX_DISTANCE_KM = 20016
+
+# k-nearest queries start at this radius and widen it by KNN_GROWTH until
+# enough listings are found.
+KNN_START_RADIUS_KM = 1.0
+KNN_GROWTH = 4
+
+GEOHASH_PRECISION = 12
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Upper bound on the number of geohash prefixes OR-ed together for one
+# radius query. Fewer, coarser cells keep the SQL small; the bounding box
+# and exact distance checks trim whatever the coarse cells over-select.
+MAX_COVER_CELLS = 16
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    d_lat = radians(lat2 - lat1)
+    d_lon = radians(lon2 - lon1)
+    a = sin(d_lat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lon / 2) ** 2
+    c = 2 * asin(sqrt(a))
+    return EARTH_RADIUS_KM * c
+
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """Return (lat_degrees, lng_degrees) covered by one cell at `precision`."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def bounding_box(lat, lng, radius_km):
+    """Return (min_lat, max_lat, min_lng, max_lng) enclosing the radius.
+
+    Longitudes are not wrapped here; callers use `longitude_ranges` to split
+    boxes that cross the antimeridian.
+    """
+    d_lat = degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(lat - d_lat, -90.0)
+    max_lat = min(lat + d_lat, 90.0)
+
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        # The circle contains a pole, every longitude qualifies.
+        return min_lat, max_lat, -180.0, 180.0
+
+    d_lng = degrees(asin(min(sin(radius_km / EARTH_RADIUS_KM) / cos(radians(lat)), 1.0)))
+    return min_lat, max_lat, lng - d_lng, lng + d_lng
+
+
+def longitude_ranges(min_lng, max_lng):
+    if max_lng - min_lng >= 360.0:
+        return [(-180.0, 180.0)]
+    if min_lng < -180.0:
+        return [(min_lng + 360.0, 180.0), (-180.0, max_lng)]
+    if max_lng > 180.0:
+        return [(min_lng, 180.0), (-180.0, max_lng - 360.0)]
+    return [(min_lng, max_lng)]
+
+
+def _cells_in_box(min_lat, max_lat, min_lng, max_lng, precision, limit):
+    """Geohash cells at `precision` covering the box, or None after `limit` steps.
+
+    The limit also ends the walk when a bound is NaN, which no comparison
+    would ever stop.
+    """
+    lat_step, lng_step = geohash_cell_size(precision)
+    cells = set()
+    steps = 0
+    lat = min_lat
+    while True:
+        lng = min_lng
+        while True:
+            steps += 1
+            if steps > limit:
+                return None
+            cells.add(encode_geohash(lat, lng, precision))
+            if lng >= max_lng:
+                break
+            lng = min(lng + lng_step, max_lng)
+        if lat >= max_lat:
+            break
+        lat = min(lat + lat_step, max_lat)
+    return cells
+
+
+def covering_cells(min_lat, max_lat, min_lng, max_lng, max_cells=MAX_COVER_CELLS):
+    """Return the finest set of geohash prefixes covering the box.
+
+    Returns an empty set when even single-character cells would exceed
+    `max_cells` (continent-sized boxes); the bounding box alone is then the
+    prefilter.
+    """
+    best = set()
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        lat_step, lng_step = geohash_cell_size(precision)
+        estimate = (
+            ((max_lat - min_lat) / lat_step + 2) *
+            sum((hi - lo) / lng_step + 2 for lo, hi in longitude_ranges(min_lng, max_lng))
+        )
+        if estimate > max_cells * 4:
+            break
+        cells = set()
+        for lo, hi in longitude_ranges(min_lng, max_lng):
+            found = _cells_in_box(min_lat, max_lat, lo, hi, precision, max_cells * 4)
+            if found is None:
+                return best
+            cells |= found
+        if len(cells) > max_cells:
+            break
+        best = cells
+    return best
+
+
+def bounding_box_q(min_lat, max_lat, min_lng, max_lng):
+    """Q object selecting rows inside the box, including the geohash prefilter."""
+    lng_q = Q()
+    for lo, hi in longitude_ranges(min_lng, max_lng):
+        lng_q |= Q(longitude__range=(lo, hi))
+
+    q = Q(latitude__range=(min_lat, max_lat)) & lng_q
+
+    cell_q = Q()
+    for cell in sorted(covering_cells(min_lat, max_lat, min_lng, max_lng)):
+        cell_q |= Q(geohash__startswith=cell)
+    if cell_q:
+        q &= cell_q
+    return q
+
+
+def viewport_q(south, west, north, east):
+    """Q object for a map viewport; `west > east` means it crosses the antimeridian."""
+    if west > east:
+        east += 360.0
+    return bounding_box_q(south, north, west, east)
+
+
+def cluster_precision(zoom):
+    """Geohash length whose cells are roughly a few dozen pixels at `zoom`.
+
+    A web map tile spans 360 / 2**zoom degrees of longitude; cells about an
+    eighth of a tile wide keep a viewport to a few hundred clusters.
+    """
+    target = 360.0 / (1 << zoom) / 8
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        if geohash_cell_size(precision)[1] < target:
+            return max(precision - 1, 1)
+    return GEOHASH_PRECISION
+
+
+def distance_expression(lat, lng):
+    """Haversine distance in km from (lat, lng) to each row, computed in SQL."""
+    d_lat = Radians(F('latitude') - Value(lat)) / 2
+    d_lng = Radians(F('longitude') - Value(lng)) / 2
+    a = (
+        Power(Sin(d_lat), 2) +
+        Cos(Value(radians(lat))) * Cos(Radians(F('latitude'))) * Power(Sin(d_lng), 2)
+    )
+    # Clamp rounding noise, PostgreSQL's asin() rejects inputs above 1.
+    return Value(2.0 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0)))
+
+
+def within_radius(queryset, lat, lng, radius_km):
+    """Restrict `queryset` to apartments within `radius_km` of (lat, lng).
+
+    The geohash prefixes and the bounding box select candidates through the
+    indexes; the exact distance is only evaluated for those candidates and is
+    left on each row as `distance_km`.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    return (
+        queryset
+        .filter(bounding_box_q(min_lat, max_lat, min_lng, max_lng))
+        .annotate(distance_km=distance_expression(lat, lng))
+        .filter(distance_km__lte=radius_km)
+    )
+
+
+def annotate_distance(queryset, lat, lng):
+    """Annotate `distance_km` on every located row, without a radius filter."""
+    return queryset.filter(latitude__isnull=False, longitude__isnull=False).annotate(
+        distance_km=distance_expression(lat, lng)
+    )
+
+
+def nearest(queryset, lat, lng, k):
+    """The `k` apartments of `queryset` closest to (lat, lng), nearest first.
+
+    Searches a radius that grows geometrically, so each round is an indexed
+    within_radius() lookup. Once a radius holds k listings, the k closest
+    listings overall are among them.
+    """
+    radius_km = KNN_START_RADIUS_KM
+    while True:
+        candidates = within_radius(queryset, lat, lng, radius_km)
+        if radius_km >= MAX_DISTANCE_KM or candidates.order_by()[:k].count() >= k:
+            return candidates.order_by('distance_km', 'pk')[:k]
+        radius_km = min(radius_km * KNN_GROWTH, MAX_DISTANCE_KM)
@@ -0,0 +1,91 @@
+import math
+
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apartments.models import Apartment
+from bookings.models import Booking
+from favorites.models import Favorite
+
+# Apartment.ranking_score is the stored relevance behind ordering=recommended.
+# rebuild() recomputes it from the source tables (run it nightly, which also
+# advances the recency decay). Between runs, counters.flush() shifts it by
+# COUNTER_NUDGES along with the buffered favorite and booking counts, so
+# popular listings move up without a write per event.
+
+BOOKING_WEIGHT = 3.0
+FAVORITE_WEIGHT = 2.0
+VIEW_WEIGHT = 1.0
+RATING_WEIGHT = 1.0  # per star of the average rating
+FRESHNESS_WEIGHT = 5.0
+FRESHNESS_HALF_LIFE_DAYS = 30.0
+
+COUNTED_BOOKING_STATUSES = ['pending', 'approved', 'completed']
+
+# Fixed increments per unit of an Apartment counter. Counts are log-damped
+# in score(), so these match the gain of the first few events and rebuild()
+# corrects the drift.
+COUNTER_NUDGES = {
+    'bookings_count': BOOKING_WEIGHT * math.log(2),
+    'favorites_count': FAVORITE_WEIGHT * math.log(2),
+}
+
+
+def score(bookings, favorites, views, rating, created_at, now):
+    engagement = (
+        BOOKING_WEIGHT * math.log1p(bookings) +
+        FAVORITE_WEIGHT * math.log1p(favorites) +
+        VIEW_WEIGHT * math.log1p(views)
+    )
+    quality = RATING_WEIGHT * (rating or 0.0)
+    age_days = max((now - created_at).total_seconds() / 86400, 0.0)
+    freshness = FRESHNESS_WEIGHT * 0.5 ** (age_days / FRESHNESS_HALF_LIFE_DAYS)
+    return round(engagement + quality + freshness, 6)
+
+
+def _count(model, **filters):
+    return Coalesce(Subquery(
+        model.objects
+        .filter(apartment=OuterRef('pk'), **filters)
+        .order_by()
+        .values('apartment')
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def _inputs(apartment_ids):
+    return (
+        Apartment.objects
+        .filter(id__in=apartment_ids)
+        .annotate(
+            booking_total=_count(Booking, status__in=COUNTED_BOOKING_STATUSES),
+            favorite_total=_count(Favorite),
+        )
+        .values_list('id', 'booking_total', 'favorite_total', 'views_count', 'average_rating', 'created_at')
+    )
+
+
+def refresh(apartment_ids, now=None):
+    apartment_ids = list(apartment_ids)
+    if not apartment_ids:
+        return
+    now = now or timezone.now()
+    updates = [
+        Apartment(id=apartment_id, ranking_score=score(bookings, favorites, views, rating, created_at, now))
+        for apartment_id, bookings, favorites, views, rating, created_at in _inputs(apartment_ids)
+    ]
+    Apartment.objects.bulk_update(updates, ['ranking_score'])
+
+
+def rebuild(batch_size=1000, now=None):
+    now = now or timezone.now()
+    apartment_ids = Apartment.objects.order_by('id').values_list('id', flat=True)
+    batch = []
+    for apartment_id in apartment_ids.iterator(chunk_size=batch_size):
+        batch.append(apartment_id)
+        if len(batch) >= batch_size:
+            refresh(batch, now)
+            batch = []
+    refresh(batch, now)
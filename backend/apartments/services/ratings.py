@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast
+
+from apartments.models import Apartment
+from reviews.models import Review
+
+# Apartment.average_rating, review_count and rating_<n>_count are stored so
+# listings read plain columns instead of aggregating Review per request.
+# The Review signals call adjust() for every created, edited or deleted
+# review; rebuild() recomputes everything from the reviews table.
+
+STARS = range(1, 6)
+
+
+def count_field(rating):
+    return f'rating_{rating}_count'
+
+
+def _average():
+    total = sum((F(count_field(stars)) * stars for stars in STARS), Value(0))
+    return Case(
+        When(review_count=0, then=Value(None)),
+        default=Cast(total, FloatField()) / Cast(F('review_count'), FloatField()),
+        output_field=FloatField(),
+    )
+
+
+def adjust(apartment_id, rating, delta):
+    """Add `delta` reviews with `rating` stars to an apartment's aggregates."""
+    apartments = Apartment.objects.filter(id=apartment_id)
+    with transaction.atomic():
+        apartments.update(**{
+            'review_count': F('review_count') + delta,
+            count_field(rating): F(count_field(rating)) + delta,
+        })
+        # A second statement sees the new counts; the row stays locked.
+        apartments.update(average_rating=_average())
+
+
+def refresh(apartment_ids):
+    """Recompute the aggregates of `apartment_ids` from the reviews table."""
+    apartment_ids = list(apartment_ids)
+    counts = {}
+    rows = (
+        Review.objects.filter(apartment_id__in=apartment_ids)
+        .values_list('apartment_id', 'rating').annotate(total=Count('id')).order_by()
+    )
+    for apartment_id, rating, total in rows:
+        counts.setdefault(apartment_id, {})[rating] = total
+
+    updates = []
+    for apartment_id in apartment_ids:
+        stars = counts.get(apartment_id, {})
+        apartment = Apartment(id=apartment_id, review_count=sum(stars.values()))
+        for rating in STARS:
+            setattr(apartment, count_field(rating), stars.get(rating, 0))
+        apartment.average_rating = (
+            sum(rating * total for rating, total in stars.items()) / apartment.review_count
+            if apartment.review_count else None
+        )
+        updates.append(apartment)
+    Apartment.objects.bulk_update(
+        updates, ['average_rating', 'review_count', *(count_field(rating) for rating in STARS)]
+    )
+
+
+def rebuild(batch_size=1000):
+    apartment_ids = Apartment.objects.order_by('id').values_list('id', flat=True)
+    batch = []
+    for apartment_id in apartment_ids.iterator(chunk_size=batch_size):
+        batch.append(apartment_id)
+        if len(batch) >= batch_size:
+            refresh(batch)
+            batch = []
+    if batch:
+        refresh(batch)
@@ -0,0 +1,203 @@
+import hashlib
+import json
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Cached search pages hold ordered apartment IDs, never serialized payloads,
+# so edits to a listing that do not change which listings match (or their
+# order) need no invalidation.
+#
+# Every entry is tagged with the location string it was filtered on, or with
+# ALL_TAG when there was none. A change to an apartment bumps the version of
+# ALL_TAG and of every known location string that matches the apartment's old
+# or new city/country/address, which is exactly the set of entries whose
+# result could have changed. Entries whose tag versions are stale are evicted
+# on read. The timeout is only a backstop.
+#
+# Versions are bumped once the change commits. A bump made earlier would let
+# a search that runs before the commit store the old result under the new
+# versions, where it would be served until the timeout.
+
+KEY_PREFIX = 'search'
+ALL_TAG = '*'
+LOCATIONS_KEY = f'{KEY_PREFIX}:locations'
+LOCATIONS_LOCK_KEY = f'{KEY_PREFIX}:locations:lock'
+LOCATIONS_LOCK_TIMEOUT = 5
+STAT_NAMES = ('hits', 'misses', 'stores', 'evictions', 'invalidations')
+MAX_TRACKED_LOCATIONS = 5000
+
+NORMALIZED_PARAMS = (
+    'browse_all', 'location', 'check_in', 'check_out', 'guests',
+    'min_price', 'max_price', 'property_type', 'amenities',
+    'bedrooms', 'bathrooms', 'min_size', 'max_size', 'has_photos',
+    'lat', 'lng', 'radius_km', 'ordering', 'page_size', 'cursor', 'count',
+    'facets',
+)
+
+
+def timeout():
+    return getattr(settings, 'SEARCH_CACHE_TIMEOUT', 300)
+
+
+def normalize_location(location):
+    return location.strip().lower() if location else ''
+
+
+def normalize_params(params):
+    normalized = {}
+    for name in NORMALIZED_PARAMS:
+        value = params.get(name)
+        if value in (None, ''):
+            continue
+        value = value.strip()
+        if name in ('location', 'property_type', 'browse_all', 'has_photos', 'facets'):
+            value = normalize_location(value)
+        elif name == 'amenities':
+            value = ','.join(sorted({a.strip().lower() for a in value.split(',') if a.strip()}))
+        normalized[name] = value
+    return normalized
+
+
+def _digest(value):
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+
+def _entry_key(normalized):
+    return f'{KEY_PREFIX}:entry:' + _digest(json.dumps(normalized, sort_keys=True))
+
+
+def _tag_key(tag):
+    return f'{KEY_PREFIX}:tag:' + _digest(tag)
+
+
+def _incr(name, delta=1):
+    key = f'{KEY_PREFIX}:stats:{name}'
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, timeout=None)
+
+
+def _tag_versions(tags):
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    return {tag: found.get(key, 0) for key, tag in keys.items()}
+
+
+def _tags_for(normalized):
+    location = normalized.get('location')
+    return [location] if location else [ALL_TAG]
+
+
+def lookup(normalized):
+    """Return (page, versions) for these parameters.
+
+    `page` is None on a miss. Pass `versions` back to store() so a change
+    that lands while the query runs still invalidates the stored page;
+    versions is None when the page must not be stored.
+    """
+    key = _entry_key(normalized)
+    entry = cache.get(key)
+    if entry is None and normalized.get('location'):
+        # Track the location before the query runs so changes made while it
+        # runs already bump its tag. A location that could not be tracked
+        # would never be invalidated, so its page is not stored.
+        if not _track_location(normalized['location']):
+            _incr('misses')
+            return None, None
+    versions = _tag_versions(_tags_for(normalized))
+    if entry is None:
+        _incr('misses')
+        return None, versions
+    if entry['tags'] != versions:
+        cache.delete(key)
+        _incr('evictions')
+        _incr('misses')
+        return None, versions
+    _incr('hits')
+    return entry['page'], versions
+
+
+def store(normalized, page, versions):
+    """Store `page` (a JSON-serializable dict holding the ordered IDs)."""
+    if versions is None:
+        return
+    cache.set(_entry_key(normalized), {'tags': versions, 'page': page}, timeout=timeout())
+    _incr('stores')
+
+
+def _track_location(location):
+    """Add `location` to the tracked set; return False if it could not be."""
+    if location in (cache.get(LOCATIONS_KEY) or {}):
+        return True
+    # The set is rewritten as a whole, so writers take turns; a writer that
+    # finds the lock taken gives up rather than drop someone else's update.
+    if not cache.add(LOCATIONS_LOCK_KEY, 1, timeout=LOCATIONS_LOCK_TIMEOUT):
+        return False
+    try:
+        locations = cache.get(LOCATIONS_KEY) or {}
+        if location in locations:
+            return True
+        if len(locations) >= MAX_TRACKED_LOCATIONS:
+            # A forgotten location is no longer invalidated, so retire its
+            # entries right away.
+            oldest = next(iter(locations))
+            del locations[oldest]
+            _bump([oldest])
+        locations[location] = True
+        cache.set(LOCATIONS_KEY, locations, timeout=None)
+        return True
+    finally:
+        cache.delete(LOCATIONS_LOCK_KEY)
+
+
+def _bump(tags):
+    for tag in tags:
+        key = _tag_key(tag)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+    if tags:
+        _incr('invalidations', len(tags))
+
+
+def invalidate_texts(texts):
+    """Invalidate entries whose location matches any of the given strings.
+
+    `texts` are the city, country and address values of the changed
+    apartments, both before and after the change.
+    """
+    haystacks = [normalize_location(text) for text in texts if text]
+    transaction.on_commit(partial(_bump_matching, haystacks))
+
+
+def _bump_matching(haystacks):
+    locations = cache.get(LOCATIONS_KEY) or {}
+    tags = [ALL_TAG] + [
+        location for location in locations
+        if any(location in haystack for haystack in haystacks)
+    ]
+    _bump(tags)
+
+
+def invalidate_apartments(apartment_ids):
+    from apartments.models import Apartment
+
+    texts = []
+    for row in Apartment.objects.filter(id__in=apartment_ids).values_list('city', 'country', 'address'):
+        texts.extend(row)
+    invalidate_texts(texts)
+
+
+def stats():
+    values = cache.get_many([f'{KEY_PREFIX}:stats:{name}' for name in STAT_NAMES])
+    result = {name: values.get(f'{KEY_PREFIX}:stats:{name}', 0) for name in STAT_NAMES}
+    lookups = result['hits'] + result['misses']
+    result['hit_rate'] = round(result['hits'] / lookups, 4) if lookups else None
+    return result
@@ -0,0 +1,356 @@
+import math
+import time
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime
+
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from apartments.models import Apartment, ApartmentImage
+from apartments.services import amenity_index, availability, catalog_snapshot, facets, search_cache, text_search
+from apartments.services.geo import MAX_DISTANCE_KM, annotate_distance, within_radius
+
+# One search path for every entry point (/api/search/ and its map, nearest
+# and streaming variants, the apartment list's ?search=, the chat assistant
+# and search_apartments()).
+#
+#   query = ListingQuery.from_params(request.GET)   # or ListingQuery(...)
+#   page, meta = search_engine.search_page(query, request, paginator)
+#   queryset = search_engine.queryset(query)
+#
+# plan() picks the backend. The ORM backend handles every query; the
+# snapshot backend answers the ones it supports from NumPy arrays (see
+# catalog_snapshot) and defers to the ORM when it cannot resolve a name.
+
+STATS_PREFIX = 'search:engine'
+BACKENDS = ('orm', 'snapshot', 'cache')
+
+
+class QueryError(ValueError):
+    """Invalid search parameters; the message is returned to the client."""
+
+
+def _optional(parse, value):
+    # Optional numeric filters are ignored when malformed, as they always were.
+    if value in (None, ''):
+        return None
+    try:
+        return parse(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _finite(name, value):
+    # float() accepts 'nan' and 'inf'; no bounding box can be built from them.
+    number = _optional(float, value)
+    if number is not None and not math.isfinite(number):
+        raise QueryError(f'{name} must be a finite number')
+    return number
+
+
+def viewport(value):
+    """Parse a map `bbox=south,west,north,east`, raising QueryError when invalid.
+
+    Longitudes are wrapped into [-180, 180); `west > east` afterwards means
+    the viewport crosses the antimeridian.
+    """
+    try:
+        south, west, north, east = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        raise QueryError('bbox=south,west,north,east is required')
+    if not all(math.isfinite(part) for part in (south, west, north, east)):
+        raise QueryError('bbox must be finite numbers')
+    if not -90.0 <= south <= north <= 90.0:
+        raise QueryError('bbox latitudes must be ordered south <= north within [-90, 90]')
+    if east - west >= 360.0:
+        return south, -180.0, north, 180.0
+    return south, (west + 180.0) % 360.0 - 180.0, north, (east + 180.0) % 360.0 - 180.0
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise QueryError('Invalid date format. Use YYYY-MM-DD')
+
+
+@dataclass(frozen=True)
+class ListingQuery:
+    browse_all: bool = False
+    location: str = ''  # substring of city, country or address
+    city: str = ''  # exact city name, case-insensitive
+    text: str = ''  # full-text search
+    check_in: date | None = None
+    check_out: date | None = None
+    # Require an availability period covering the stay instead of only
+    # excluding booked and blocked nights.
+    require_open_period: bool = False
+    guests: int | None = None
+    min_price: float | None = None
+    max_price: float | None = None
+    bedrooms: int | None = None
+    bathrooms: int | None = None
+    min_size: int | None = None
+    max_size: int | None = None
+    property_type: str = ''
+    amenities: tuple = field(default_factory=tuple)
+    has_photos: bool = False
+    lat: float | None = None
+    lng: float | None = None
+    radius_km: float | None = None
+    ordering: str = ''
+    facets: bool = False
+    available_only: bool = True
+
+    @classmethod
+    def from_params(cls, params, located=False):
+        """Parse /api/search/ query parameters, raising QueryError when invalid.
+
+        `located` is set by endpoints that take their own area (a map
+        viewport, a point); it stands in for the location and dates that
+        /api/search/ otherwise requires.
+        """
+        browse_all = params.get('browse_all', 'false').lower() == 'true'
+        location = params.get('location', '').strip()
+        check_in = params.get('check_in')
+        check_out = params.get('check_out')
+
+        try:
+            guests = int(params.get('guests', 1))
+        except (TypeError, ValueError):
+            raise QueryError('Invalid guest count')
+
+        if not browse_all and not located and (not location or not check_in or not check_out):
+            raise QueryError(
+                'Missing required fields: check_in, check_out, and location are required unless browse_all=true'
+            )
+        if bool(check_in) != bool(check_out):
+            raise QueryError('Both check_in and check_out must be provided together.')
+        if check_in:
+            check_in, check_out = _date(check_in), _date(check_out)
+            if check_in >= check_out:
+                raise QueryError('Check-out date must be after check-in date')
+
+        lat = _finite('lat', params.get('lat'))
+        if lat is not None:
+            lat = min(max(lat, -90.0), 90.0)
+        lng = _finite('lng', params.get('lng'))
+        if lng is not None:
+            lng = (lng + 180.0) % 360.0 - 180.0
+        radius_km = _finite('radius_km', params.get('radius_km'))
+        if radius_km is not None:
+            if radius_km <= 0:
+                raise QueryError('radius_km must be positive')
+            radius_km = min(radius_km, MAX_DISTANCE_KM)
+        ordering = params.get('ordering', '')
+        if ordering == 'distance' and (lat is None or lng is None):
+            raise QueryError('ordering=distance requires lat and lng')
+
+        return cls(
+            browse_all=browse_all,
+            location=location,
+            check_in=check_in or None,
+            check_out=check_out or None,
+            guests=guests,
+            min_price=_optional(float, params.get('min_price')),
+            max_price=_optional(float, params.get('max_price')),
+            bedrooms=_optional(int, params.get('bedrooms')),
+            bathrooms=_optional(int, params.get('bathrooms')),
+            min_size=_optional(int, params.get('min_size')),
+            max_size=_optional(int, params.get('max_size')),
+            property_type=params.get('property_type', '').strip(),
+            amenities=tuple(name.strip() for name in params.get('amenities', '').split(',') if name.strip()),
+            has_photos=params.get('has_photos', '').lower() == 'true',
+            lat=lat,
+            lng=lng,
+            radius_km=radius_km,
+            ordering=ordering,
+            facets=params.get('facets', 'false').lower() == 'true',
+        )
+
+    @property
+    def has_radius(self):
+        return None not in (self.lat, self.lng, self.radius_km)
+
+
+class OrmBackend:
+    name = 'orm'
+
+    def supports(self, query):
+        return True
+
+    def apply(self, queryset, query):
+        """Apply `query`'s filters to `queryset`.
+
+        Every filter is a subquery or a to-one join, so rows stay unique and
+        the result can be grouped (facets, map clusters) without DISTINCT.
+        """
+        if query.available_only:
+            queryset = queryset.filter(is_available=True)
+        if query.location:
+            queryset = text_search.filter_location(queryset, query.location)
+        if query.city:
+            queryset = queryset.filter(city__iexact=query.city)
+        if query.text:
+            queryset = text_search.search_listings(queryset, query.text)
+
+        if query.has_radius:
+            queryset = within_radius(queryset, query.lat, query.lng, query.radius_km)
+        elif query.ordering == 'distance':
+            # Without a radius every located listing is a candidate; use
+            # /api/search/nearest/ for an indexed top-k.
+            queryset = annotate_distance(queryset, query.lat, query.lng)
+
+        if query.check_in and query.check_out:
+            if query.require_open_period:
+                queryset = availability.filter_open(queryset, query.check_in, query.check_out)
+            else:
+                queryset = availability.exclude_booked(queryset, query.check_in, query.check_out)
+
+        bounds = {
+            'max_guests__gte': query.guests,
+            'bedrooms__gte': query.bedrooms,
+            'bathrooms__gte': query.bathrooms,
+            'size_sqm__gte': query.min_size,
+            'size_sqm__lte': query.max_size,
+            'price_per_month__gte': query.min_price,
+            'price_per_month__lte': query.max_price,
+        }
+        queryset = queryset.filter(**{lookup: value for lookup, value in bounds.items() if value is not None})
+
+        if query.property_type:
+            queryset = queryset.filter(property_type__name__iexact=query.property_type)
+        if query.amenities:
+            queryset = amenity_index.filter_has_all(queryset, query.amenities)
+        if query.has_photos:
+            queryset = queryset.filter(Exists(ApartmentImage.objects.filter(apartment=OuterRef('pk'))))
+        return queryset
+
+    def paginate(self, query, paginator, request):
+        return paginator.paginate_queryset(self.apply(Apartment.objects.for_listing(), query), request)
+
+
+class SnapshotBackend:
+    name = 'snapshot'
+
+    def supports(self, query):
+        return catalog_snapshot.enabled() and not (
+            query.text or query.city or query.check_in or query.has_photos or
+            query.lat is not None or query.ordering == 'distance' or not query.available_only
+        )
+
+    def paginate(self, query, paginator, request):
+        """Return the page, or None when the snapshot cannot answer."""
+        selection = catalog_snapshot.catalog_snapshot.select(query)
+        if selection is None:
+            return None
+        return paginator.paginate_selection(selection, hydrate, request)
+
+
+orm_backend = OrmBackend()
+snapshot_backend = SnapshotBackend()
+
+
+@dataclass(frozen=True)
+class Plan:
+    backend: object
+    cache: bool = True
+
+
+def plan(query, backend=None):
+    """Choose how to run `query`; `backend` forces one (for benchmarks)."""
+    if backend is not None:
+        return Plan(backend=backend, cache=False)
+    if snapshot_backend.supports(query):
+        return Plan(backend=snapshot_backend)
+    return Plan(backend=orm_backend)
+
+
+def queryset(query, base=None):
+    """The ORM queryset matching `query`, for callers that need one."""
+    return orm_backend.apply(Apartment.objects.all() if base is None else base, query)
+
+
+def hydrate(ids, distances=None):
+    """Load apartments for the listing serializers, in the order of `ids`."""
+    apartments = Apartment.objects.for_listing().in_bulk(ids)
+    page = [apartments[pk] for pk in ids if pk in apartments]
+    if distances is not None:
+        by_id = dict(zip(ids, distances))
+        for apartment in page:
+            apartment.distance_km = by_id[apartment.pk]
+    return page
+
+
+def _meta(paginator):
+    return {
+        'count': paginator.total,
+        'count_is_exact': paginator.count_is_exact,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+    }
+
+
+def search_page(query, request, paginator, backend=None):
+    """Return (page, meta) for one page of `query`.
+
+    `meta` holds the pagination fields (and facets when asked for); pages
+    are cached by their request parameters through search_cache.
+    """
+    started = time.perf_counter()
+    chosen = plan(query, backend)
+
+    if chosen.cache:
+        params = search_cache.normalize_params(request.GET)
+        cached, versions = search_cache.lookup(params)
+        if cached is not None:
+            page = hydrate(cached['ids'], cached.get('distances'))
+            _record('cache', started)
+            return page, cached['meta']
+
+    page = chosen.backend.paginate(query, paginator, request)
+    if page is None:
+        chosen = replace(chosen, backend=orm_backend)
+        page = orm_backend.paginate(query, paginator, request)
+
+    meta = _meta(paginator)
+    if query.facets:
+        meta['facets'] = facets.compute(queryset(query))
+
+    if chosen.cache:
+        entry = {'ids': [apartment.pk for apartment in page], 'meta': meta}
+        if page and hasattr(page[0], 'distance_km'):
+            entry['distances'] = [apartment.distance_km for apartment in page]
+        search_cache.store(params, entry, versions)
+
+    _record(chosen.backend.name, started)
+    return page, meta
+
+
+def _incr(key, delta):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, timeout=None)
+
+
+def _record(backend, started):
+    elapsed_us = int((time.perf_counter() - started) * 1_000_000)
+    _incr(f'{STATS_PREFIX}:{backend}:queries', 1)
+    _incr(f'{STATS_PREFIX}:{backend}:micros', elapsed_us)
+
+
+def stats():
+    """Pages served and mean latency (ms) per backend, cache hits included."""
+    keys = [f'{STATS_PREFIX}:{backend}:{name}' for backend in BACKENDS for name in ('queries', 'micros')]
+    values = cache.get_many(keys)
+    result = {}
+    for backend in BACKENDS:
+        queries = values.get(f'{STATS_PREFIX}:{backend}:queries', 0)
+        micros = values.get(f'{STATS_PREFIX}:{backend}:micros', 0)
+        result[backend] = {
+            'queries': queries,
+            'mean_ms': round(micros / queries / 1000, 3) if queries else None,
+        }
+    return result
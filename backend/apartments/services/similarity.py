@@ -0,0 +1,132 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apartments.models import Apartment
+from apartments.services.catalog_snapshot import catalog_snapshot, np
+
+# "Similar apartments" are the nearest rows by cosine similarity in a feature
+# matrix built from the catalog snapshot: standardized log price and size,
+# bedrooms and bathrooms, one-hot property type, amenity bits and the
+# position on the unit sphere. The matrix is rebuilt when the snapshot's
+# content changes (its row count or newest updated_at), and scoring one
+# apartment is a single matrix-vector product. Results are cached per
+# apartment as ordered IDs. The snapshot is loaded for this whether or not
+# searches use it (SEARCH_SNAPSHOT_ENABLED). Without NumPy, or with
+# SIMILARITY_MATRIX_ENABLED off, the ORM fallback below is used.
+
+CACHE_PREFIX = 'similar'
+
+NUMERIC_WEIGHT = 1.0
+PROPERTY_TYPE_WEIGHT = 1.0
+AMENITY_WEIGHT = 1.0  # spread over the apartment's amenity bits
+# Scale of the sphere coordinates; differences of ~100 km barely register,
+# so listings in the same city score alike and other cities fall behind.
+LOCATION_WEIGHT = 3.0
+
+
+def timeout():
+    return getattr(settings, 'SIMILAR_CACHE_TIMEOUT', 3600)
+
+
+def enabled():
+    return np is not None and getattr(settings, 'SIMILARITY_MATRIX_ENABLED', True)
+
+
+def _standardize(values):
+    std = values.std()
+    return (values - values.mean()) / std if std else np.zeros_like(values)
+
+
+class SimilarityIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._columns = None
+        self._ids = None
+        self._matrix = None
+
+    def _build(self, columns):
+        ids = columns['id']
+        numeric = [
+            _standardize(np.log1p(columns['price_per_month'])),
+            _standardize(np.log1p(columns['size_sqm'].astype('float64'))),
+            _standardize(columns['bedrooms'].astype('float64')),
+            _standardize(columns['bathrooms'].astype('float64')),
+        ]
+
+        type_ids, type_index = np.unique(columns['property_type_id'], return_inverse=True)
+        types = np.zeros((len(ids), len(type_ids)))
+        types[np.arange(len(ids)), type_index] = PROPERTY_TYPE_WEIGHT
+
+        bits = np.arange(63, dtype='int64')
+        amenities = ((columns['amenity_mask'][:, None] >> bits) & 1).astype('float64')
+        counts = amenities.sum(axis=1, keepdims=True)
+        amenities = np.divide(amenities * AMENITY_WEIGHT, np.sqrt(counts), out=amenities, where=counts > 0)
+
+        lat = np.radians(columns['latitude'])
+        lng = np.radians(columns['longitude'])
+        sphere = np.stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)], axis=1)
+        sphere = np.nan_to_num(sphere) * LOCATION_WEIGHT
+
+        matrix = np.hstack([np.stack(numeric, axis=1) * NUMERIC_WEIGHT, types, amenities, sphere])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+        return ids, matrix.astype('float32')
+
+    def _current(self):
+        columns = catalog_snapshot.columns()
+        version = (len(columns['id']), int(columns['updated_at'].max(initial=0)))
+        with self._lock:
+            if version != self._version:
+                self._ids, self._matrix = self._build(columns)
+                self._columns, self._version = columns, version
+            return self._columns, self._ids, self._matrix
+
+    def similar_ids(self, apartment_id, k):
+        """IDs of the `k` available apartments most like `apartment_id`, or
+        None when the apartment is not in the snapshot yet."""
+        columns, ids, matrix = self._current()
+        row = np.searchsorted(ids, apartment_id)
+        if row >= len(ids) or ids[row] != apartment_id:
+            return None
+        scores = matrix @ matrix[row]
+        scores[~columns['is_available']] = -np.inf
+        scores[row] = -np.inf
+        k = min(k, int(np.isfinite(scores).sum()))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return ids[top].tolist()
+
+
+similarity_index = SimilarityIndex()
+
+
+def _fallback_ids(apartment, k):
+    """Same city and property type, closest price first (no NumPy)."""
+    queryset = (
+        Apartment.objects
+        .filter(is_available=True, city__iexact=apartment.city, property_type_id=apartment.property_type_id)
+        .exclude(pk=apartment.pk)
+        .values_list('id', 'price_per_month')
+    )
+    rows = sorted(queryset[:500], key=lambda row: (abs(row[1] - apartment.price_per_month), row[0]))
+    return [pk for pk, _ in rows[:k]]
+
+
+def similar_apartments(apartment, k=10):
+    """Return the apartments most similar to `apartment`, best match first."""
+    key = f'{CACHE_PREFIX}:{apartment.pk}:{k}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = similarity_index.similar_ids(apartment.pk, k) if enabled() else None
+        if ids is None:
+            ids = _fallback_ids(apartment, k)
+        cache.set(key, ids, timeout=timeout())
+
+    apartments = Apartment.objects.for_listing().in_bulk(ids)
+    return [apartments[pk] for pk in ids if pk in apartments]
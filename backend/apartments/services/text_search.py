@@ -0,0 +1,76 @@
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+
+# PostgreSQL keeps a weighted tsvector per apartment and trigram GIN indexes
+# on UPPER(col::text) for the icontains lookups below (migration 0010). Other
+# backends, i.e. SQLite test runs, run the same lookups without indexes.
+
+SEARCH_CONFIG = 'simple'  # listings mix English, Russian and Kyrgyz text
+TEXT_FIELDS = ('title', 'description', 'address', 'city', 'country')
+LOCATION_FIELDS = ('city', 'country', 'address')
+
+
+def search_vector():
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector('city', 'country', weight='B', config=SEARCH_CONFIG) +
+        SearchVector('address', weight='C', config=SEARCH_CONFIG) +
+        SearchVector('description', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def uses_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def update_search_vectors(queryset):
+    """Recompute the stored vector of every apartment in `queryset`."""
+    if uses_postgres(queryset):
+        queryset.update(search_vector=search_vector())
+
+
+def filter_location(queryset, location):
+    return queryset.filter(reduce(or_, (
+        Q(**{f'{field}__icontains': location}) for field in LOCATION_FIELDS
+    )))
+
+
+def prefix_query(text):
+    """A tsquery requiring every word of `text` as a word prefix, so a
+    partly typed 'bish' still finds 'Bishkek'. None when `text` has no words.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return SearchQuery(' & '.join(f'{word}:*' for word in words), config=SEARCH_CONFIG, search_type='raw')
+
+
+def search_listings(queryset, text):
+    """Filter on free text and annotate a `search_rank` to order by.
+
+    On PostgreSQL each word must start a word of the listing; other backends
+    match each word as a substring.
+    """
+    terms = text.split()
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    if uses_postgres(queryset):
+        query = prefix_query(text)
+        if query is None:
+            return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+        return (
+            queryset
+            .filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F('search_vector'), query))
+        )
+
+    return queryset.filter(reduce(and_, (
+        reduce(or_, (Q(**{f'{field}__icontains': term}) for field in TEXT_FIELDS))
+        for term in terms
+    ))).annotate(search_rank=Value(0.0, output_field=FloatField()))
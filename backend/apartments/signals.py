@@ -0,0 +1,124 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Amenity, Apartment, ApartmentAvailability, ApartmentImage
+from .services import amenity_index, availability, ranking, search_cache, text_search
+from .services.autocomplete import location_index
+
+
+@receiver(pre_save, sender=Apartment)
+def remember_previous_text(sender, instance, **kwargs):
+    instance._previous_text = {}
+    if instance.pk:
+        instance._previous_text = (
+            Apartment.objects
+            .filter(pk=instance.pk)
+            .values(*text_search.TEXT_FIELDS)
+            .first()
+        ) or {}
+
+
+@receiver(post_save, sender=Apartment)
+@receiver(post_delete, sender=Apartment)
+def invalidate_apartment_searches(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_text', {})
+    search_cache.invalidate_texts([
+        value
+        for field in text_search.LOCATION_FIELDS
+        for value in (previous.get(field), getattr(instance, field))
+    ])
+
+
+@receiver(post_save, sender=Apartment)
+def update_apartment_search_vector(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_text', {})
+    if created or any(previous.get(field) != getattr(instance, field) for field in text_search.TEXT_FIELDS):
+        text_search.update_search_vectors(Apartment.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Apartment)
+def update_location_index(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_text', {})
+    current = (instance.city, instance.country)
+    if created:
+        location_index.adjust(*current, 1)
+    elif previous and (previous['city'], previous['country']) != current:
+        location_index.adjust(previous['city'], previous['country'], -1)
+        location_index.adjust(*current, 1)
+
+
+@receiver(post_save, sender=Apartment)
+def rank_new_apartment(sender, instance, created, **kwargs):
+    if created:
+        # New listings start with their freshness bonus instead of waiting
+        # for the nightly recompute.
+        ranking.refresh([instance.pk])
+
+
+@receiver(post_delete, sender=Apartment)
+def remove_from_location_index(sender, instance, **kwargs):
+    location_index.adjust(instance.city, instance.country, -1)
+
+
+@receiver(post_save, sender=ApartmentImage)
+@receiver(post_delete, sender=ApartmentImage)
+def invalidate_image_searches(sender, instance, **kwargs):
+    search_cache.invalidate_apartments([instance.apartment_id])
+
+
+@receiver(m2m_changed, sender=Amenity.apartments.through)
+def sync_amenity_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        # pk_set is not provided for clear(), collect the apartments first.
+        instance._cleared_apartment_ids = list(instance.apartments.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        apartment_ids = [instance.pk]
+    elif action == 'post_clear':
+        apartment_ids = getattr(instance, '_cleared_apartment_ids', [])
+    else:
+        apartment_ids = pk_set
+    amenity_index.refresh(apartment_ids)
+    search_cache.invalidate_apartments(apartment_ids)
+
+
+@receiver(pre_delete, sender=Amenity)
+def remember_amenity_apartments(sender, instance, **kwargs):
+    # Deleting an amenity removes its M2M rows without sending m2m_changed.
+    instance._linked_apartment_ids = list(instance.apartments.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Amenity)
+def sync_deleted_amenity(sender, instance, **kwargs):
+    apartment_ids = getattr(instance, '_linked_apartment_ids', [])
+    amenity_index.refresh(apartment_ids)
+    search_cache.invalidate_apartments(apartment_ids)
+
+
+@receiver(pre_save, sender=ApartmentAvailability)
+def remember_previous_period(sender, instance, **kwargs):
+    instance._previous_range = None
+    if instance.pk:
+        instance._previous_range = (
+            ApartmentAvailability.objects
+            .filter(pk=instance.pk)
+            .values_list('apartment_id', 'start_date', 'end_date')
+            .first()
+        )
+
+
+@receiver(post_save, sender=ApartmentAvailability)
+def refresh_period_availability(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_range', None)
+    if previous and previous != (instance.apartment_id, instance.start_date, instance.end_date):
+        availability.refresh(*previous)
+    availability.refresh(instance.apartment_id, instance.start_date, instance.end_date)
+    search_cache.invalidate_apartments([instance.apartment_id])
+
+
+@receiver(post_delete, sender=ApartmentAvailability)
+def clear_period_availability(sender, instance, **kwargs):
+    availability.refresh(instance.apartment_id, instance.start_date, instance.end_date)
+    search_cache.invalidate_apartments([instance.apartment_id])
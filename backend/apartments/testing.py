@@ -0,0 +1,72 @@
+from datetime import date
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from bookings.models import Booking
+from users.models import CustomUser
+from .models import Apartment, PropertyType
+
+
+class AdminChangelistTestMixin:
+    """Fixtures for admin changelist query-count tests.
+
+    add_listings() creates an owner, a tenant, an apartment and a completed
+    booking per listing; listing_created() is the hook for anything a
+    particular changelist needs on top. assert_constant() loads a changelist
+    at two sizes and checks the query count stays the same and within budget.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.admin = CustomUser.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        self.client.force_login(self.admin)
+        self.property_type = PropertyType.objects.create(name='Flat')
+        self.created = 0
+
+    def listing_created(self, apartment, booking):
+        pass
+
+    def add_listings(self, count):
+        for _ in range(count):
+            self.created += 1
+            owner = CustomUser.objects.create_user(
+                username=f'owner{self.created}', email=f'owner{self.created}@example.com', password='x',
+                user_type='landlord'
+            )
+            tenant = CustomUser.objects.create_user(
+                username=f'tenant{self.created}', email=f'tenant{self.created}@example.com', password='x',
+                user_type='tenant'
+            )
+            apartment = Apartment.objects.create(
+                owner=owner,
+                property_type=self.property_type,
+                title=f'Flat {self.created}',
+                description='A flat',
+                address='1 Main St',
+                city='Bishkek',
+                country='Kyrgyzstan',
+                price_per_month=500,
+                bedrooms=2,
+                bathrooms=1,
+                size_sqm=50,
+            )
+            booking = Booking.objects.create(
+                tenant=tenant, apartment=apartment, status='completed',
+                start_date=date(2024, 1, 1), end_date=date(2024, 1, 5), total_price=100
+            )
+            self.listing_created(apartment, booking)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_constant(self, url, budget):
+        self.add_listings(2)
+        small = self.changelist_queries(url)
+        self.add_listings(4)
+        large = self.changelist_queries(url)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, budget)
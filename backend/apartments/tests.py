@@ -1,3 +1,360 @@
-from django.test import TestCase
+import base64
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from favorites.models import Favorite
+from users.models import CustomUser
+from .models import Amenity, Apartment, ApartmentImage, PropertyType
+from .services import counters, geo, ranking, similarity
+from .services.catalog_snapshot import catalog_snapshot
+from .testing import AdminChangelistTestMixin
+
+
+class SearchQueryCountTests(TestCase):
+    """The search page must cost the same number of queries at any size."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = CustomUser.objects.create_user(username='owner', password='x', user_type='landlord')
+        self.tenant = CustomUser.objects.create_user(username='tenant', password='x', user_type='tenant')
+        self.property_type = PropertyType.objects.create(name='Flat')
+        self.amenities = [Amenity.objects.create(name=name) for name in ('Wifi', 'Parking')]
+        self.client = APIClient()
+        self.client.force_authenticate(self.tenant)
+
+    def add_apartments(self, count):
+        for _ in range(count):
+            apartment = Apartment.objects.create(
+                owner=self.owner,
+                property_type=self.property_type,
+                title='Flat',
+                description='A flat',
+                address='1 Main St',
+                city='Bishkek',
+                country='Kyrgyzstan',
+                price_per_month=500,
+                bedrooms=2,
+                bathrooms=1,
+                size_sqm=50,
+            )
+            apartment.amenities.set(self.amenities)
+            ApartmentImage.objects.create(apartment=apartment, image='apartments/a.jpg', is_primary=True)
+            ApartmentImage.objects.create(apartment=apartment, image='apartments/b.jpg')
+            Favorite.objects.create(user=self.tenant, apartment=apartment)
+
+    def search_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/search/', {'browse_all': 'true', 'page_size': 50})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['results']
+
+    def test_query_count_does_not_grow_with_page(self):
+        self.add_apartments(2)
+        small, results = self.search_queries()
+        self.assertEqual(len(results), 2)
+
+        self.add_apartments(4)
+        large, results = self.search_queries()
+        self.assertEqual(len(results), 6)
+
+        self.assertEqual(small, large)
+        # count, page, images, amenities and the user's favorites
+        self.assertLessEqual(large, 5)
+        self.assertTrue(all(result['is_favorited'] for result in results))
+        self.assertTrue(all(result['primary_image']['is_primary'] for result in results))
+
+    def test_cached_page_query_count(self):
+        self.add_apartments(3)
+        self.client.get('/api/search/', {'browse_all': 'true'})
+        with self.assertNumQueries(3):  # page by id, images, amenities; favorites are cached
+            response = self.client.get('/api/search/', {'browse_all': 'true'})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_toggle_updates_cached_favorites(self):
+        self.add_apartments(2)
+        self.client.get('/api/search/', {'browse_all': 'true'})
+        unfavorited = Apartment.objects.order_by('id').first()
+
+        # The cached set is patched on commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/favorites/toggle/', {'apartment_id': unfavorited.pk}, format='json')
+        self.assertEqual(response.data, {'status': 'removed'})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/search/', {'browse_all': 'true'})
+        self.assertFalse(any('favorites_favorite' in query['sql'] for query in queries.captured_queries))
+        favorited = {result['id']: result['is_favorited'] for result in response.data['results']}
+        self.assertEqual(favorited, {apartment.pk: apartment.pk != unfavorited.pk for apartment in Apartment.objects.all()})
+
+        response = self.client.post('/favorites/toggle/', {'apartment_id': unfavorited.pk}, format='json')
+        self.assertEqual(response.data, {'status': 'added'})
+        self.assertTrue(Favorite.objects.filter(user=self.tenant, apartment=unfavorited).exists())
+
+        response = self.client.post('/favorites/toggle/', {'apartment_id': 999999}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchCursorPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        owner = CustomUser.objects.create_user(username='owner', password='x', user_type='landlord')
+        property_type = PropertyType.objects.create(name='Flat')
+        # Repeated prices make the walk depend on the id tie-break.
+        for price in (700, 500, 300, 500, 500):
+            Apartment.objects.create(
+                owner=owner,
+                property_type=property_type,
+                title='Flat',
+                description='A flat',
+                address='1 Main St',
+                city='Bishkek',
+                country='Kyrgyzstan',
+                price_per_month=price,
+                bedrooms=2,
+                bathrooms=1,
+                size_sqm=50,
+            )
+        self.client = APIClient()
+
+    def walk(self, response, link):
+        pages = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([result['id'] for result in response.data['results']])
+            if not response.data[link]:
+                return pages, response
+            response = self.client.get(response.data[link])
+
+    def test_forward_and_backward_walks(self):
+        for ordering in ('price_per_month', '-price_per_month', '-created_at'):
+            tie_break = '-id' if ordering.startswith('-') else 'id'
+            expected = list(Apartment.objects.order_by(ordering, tie_break).values_list('id', flat=True))
+            response = self.client.get('/api/search/', {'browse_all': 'true', 'page_size': 2, 'ordering': ordering})
+
+            pages, last = self.walk(response, 'next')
+            self.assertEqual([len(page) for page in pages], [2, 2, 1])
+            self.assertEqual(sum(pages, []), expected)
+
+            pages, first = self.walk(last, 'previous')
+            self.assertEqual([len(page) for page in pages], [1, 2, 2])
+            self.assertEqual(sum(reversed(pages), []), expected)
+            self.assertIsNone(first.data['previous'])
+
+    def test_invalid_cursor(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode('ascii')).decode('ascii')
+
+        cursors = [
+            ('-created_at', 'not-a-cursor'),
+            ('-created_at', encode([1, 2])),
+            ('-created_at', encode({'v': 'abc', 'id': 1})),
+            ('-created_at', encode({'v': '2030-01-01T00:00:00', 'id': 1})),
+            ('-created_at', encode({'v': None, 'id': 1})),
+            ('price_per_month', encode({'v': 'abc', 'id': 1})),
+            ('price_per_month', encode({'v': '500', 'id': 'x'})),
+            ('recommended', encode({'v': 'abc', 'id': 1})),
+        ]
+        for ordering, cursor in cursors:
+            response = self.client.get('/api/search/', {'browse_all': 'true', 'ordering': ordering, 'cursor': cursor})
+            self.assertEqual(response.status_code, 404, (ordering, cursor))
+
+
+class SearchCoordinateTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        owner = CustomUser.objects.create_user(username='owner', password='x', user_type='landlord')
+        self.apartment = Apartment.objects.create(
+            owner=owner,
+            property_type=PropertyType.objects.create(name='Flat'),
+            title='Flat',
+            description='A flat',
+            address='1 Main St',
+            city='Bishkek',
+            country='Kyrgyzstan',
+            price_per_month=500,
+            bedrooms=2,
+            bathrooms=1,
+            size_sqm=50,
+            latitude=42.87,
+            longitude=74.59,
+        )
+        self.client = APIClient()
+
+    def test_radius_search(self):
+        response = self.client.get('/api/search/', {'browse_all': 'true', 'lat': 42.88, 'lng': 74.6, 'radius_km': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['id'] for result in response.data['results']], [self.apartment.pk])
+
+    def test_invalid_coordinates(self):
+        for params in (
+            {'lat': 'nan', 'lng': 1, 'radius_km': 5},
+            {'lat': 1, 'lng': 'inf', 'radius_km': 5},
+            {'lat': 1, 'lng': 1, 'radius_km': 'nan'},
+            {'lat': 1, 'lng': 1, 'radius_km': 0},
+            {'lat': 1, 'lng': 1, 'radius_km': -5},
+        ):
+            response = self.client.get('/api/search/', {'browse_all': 'true', **params})
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_map_viewport(self):
+        response = self.client.get('/api/search/map/', {'bbox': '42,74,43,75', 'zoom': 15})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([marker['id'] for marker in response.data['markers']], [self.apartment.pk])
+        # Unwrapped longitudes, and a viewport across the antimeridian.
+        for bbox in ('42,-290,43,-280', '42,74,43,-170'):
+            response = self.client.get('/api/search/map/', {'bbox': bbox, 'zoom': 15})
+            self.assertEqual([marker['id'] for marker in response.data['markers']], [self.apartment.pk], bbox)
+
+    def test_invalid_viewport(self):
+        for bbox in ('nan,1,2,3', '1,inf,2,3', '43,74,42,75', '-91,74,43,75', '1,2,3', 'a,b,c,d'):
+            response = self.client.get('/api/search/map/', {'bbox': bbox})
+            self.assertEqual(response.status_code, 400, bbox)
+        self.assertEqual(self.client.get('/api/search/map/').status_code, 400)
+
+    def test_nearest(self):
+        response = self.client.get('/api/search/nearest/', {'lat': 42, 'lng': 74})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['id'] for result in response.data['results']], [self.apartment.pk])
+        # 434.6 is 74.6 wrapped once around the globe.
+        response = self.client.get('/api/search/nearest/', {'lat': 42.88, 'lng': 434.6, 'radius_km': 5})
+        self.assertEqual([result['id'] for result in response.data['results']], [self.apartment.pk])
+
+    def test_invalid_nearest_point(self):
+        for params in ({'lat': 'nan', 'lng': 1}, {'lat': 1, 'lng': '-inf'}, {'lat': 1}, {'lat': 'x', 'lng': 1}):
+            response = self.client.get('/api/search/nearest/', {'browse_all': 'true', **params})
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_cover_of_nan_box_ends(self):
+        self.assertEqual(geo.covering_cells(float('nan'), 1.0, 1.0, 2.0), set())
+
+
+class SimilarApartmentTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        catalog_snapshot._columns = None  # drop rows left by other tests
+        self.owner = CustomUser.objects.create_user(username='owner', password='x', user_type='landlord')
+        self.property_type = PropertyType.objects.create(name='Flat')
+        self.amenities = [Amenity.objects.create(name=name) for name in ('Wifi', 'Parking', 'Balcony')]
+
+    def add(self, price, bedrooms, size, amenities):
+        apartment = Apartment.objects.create(
+            owner=self.owner,
+            property_type=self.property_type,
+            title='Flat',
+            description='A flat',
+            address='1 Main St',
+            city='Bishkek',
+            country='Kyrgyzstan',
+            price_per_month=price,
+            bedrooms=bedrooms,
+            bathrooms=1,
+            size_sqm=size,
+        )
+        apartment.amenities.set(amenities)
+        return apartment
+
+    def test_ranks_by_features_by_default(self):
+        target = self.add(500, 2, 50, self.amenities)
+        # Closest in price, otherwise unlike the target.
+        mansion = self.add(505, 6, 300, [])
+        twin = self.add(600, 2, 52, self.amenities)
+        self.assertEqual(similarity.similar_apartments(target, k=2), [twin, mansion])
+
+
+class ApartmentCounterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        counters.local_buffer.flush()  # views left by other tests, before their rows exist again
+        owner = CustomUser.objects.create_user(username='owner', password='x', user_type='landlord')
+        self.apartment = Apartment.objects.create(
+            owner=owner,
+            property_type=PropertyType.objects.create(name='Flat'),
+            title='Flat',
+            description='A flat',
+            address='1 Main St',
+            city='Bishkek',
+            country='Kyrgyzstan',
+            price_per_month=500,
+            bedrooms=2,
+            bathrooms=1,
+            size_sqm=50,
+        )
+
+    def views(self):
+        return Apartment.objects.values_list('views_count', flat=True).get(pk=self.apartment.pk)
+
+    @override_settings(COUNTERS_CACHE='default')
+    def test_increment_then_flush(self):
+        counters.increment(self.apartment.pk, 'views_count')
+        counters.increment(self.apartment.pk, 'views_count')
+        self.assertEqual(counters.pending(self.apartment.pk)['views_count'], 2)
+        self.assertEqual(self.views(), 0)
+
+        self.assertEqual(counters.flush(), 1)
+        self.assertEqual(self.views(), 2)
+        self.assertEqual(counters.pending(self.apartment.pk)['views_count'], 0)
+        self.assertIsNone(cache.get(counters._slot_key(1)))
+
+        counters.increment(self.apartment.pk, 'views_count')
+        self.assertEqual(counters.flush(), 1)
+        self.assertEqual(self.views(), 3)
+        self.assertEqual(counters.flush(), 0)
+
+    @override_settings(COUNTERS_CACHE='default')
+    def test_flush_nudges_ranking_score(self):
+        def score():
+            return Apartment.objects.values_list('ranking_score', flat=True).get(pk=self.apartment.pk)
+
+        before = score()
+        counters.increment(self.apartment.pk, 'favorites_count')
+        counters.increment(self.apartment.pk, 'bookings_count')
+        self.assertEqual(score(), before)
+
+        counters.flush()
+        nudge = ranking.COUNTER_NUDGES['favorites_count'] + ranking.COUNTER_NUDGES['bookings_count']
+        self.assertAlmostEqual(score(), before + nudge)
+
+    def test_views_buffered_in_process_without_shared_cache(self):
+        counters.increment(self.apartment.pk, 'views_count')
+        counters.increment(self.apartment.pk, 'views_count')
+        self.assertEqual(self.views(), 0)
+        self.assertEqual(counters.pending(self.apartment.pk)['views_count'], 2)
+
+        with mock.patch.object(counters, 'LOCAL_FLUSH_INTERVAL', 0):
+            counters.increment(self.apartment.pk, 'views_count')
+        self.assertEqual(self.views(), 3)
+        self.assertEqual(counters.pending(self.apartment.pk)['views_count'], 0)
+
+        counters.increment(self.apartment.pk, 'views_count')
+        self.assertEqual(counters.flush(), 1)
+        self.assertEqual(self.views(), 4)
+
+    def test_unbuffered_favorites_write_through(self):
+        counters.increment(self.apartment.pk, 'favorites_count')
+        self.assertEqual(Apartment.objects.get(pk=self.apartment.pk).favorites_count, 1)
+
+
+class AdminChangelistQueryCountTests(AdminChangelistTestMixin, TestCase):
+    """Changelists must cost the same number of queries at any page size."""
+
+    def listing_created(self, apartment, booking):
+        apartment.amenities.add(Amenity.objects.create(name=f'Amenity {self.created}'))
+
+    def test_apartment_changelist(self):
+        self.assert_constant('/admin/apartments/apartment/', 4)
+        # Sorted by the computed Bookings column (9th in list_display).
+        self.assertEqual(self.changelist_queries('/admin/apartments/apartment/?o=-9'), 4)
+
+    def test_amenity_changelist(self):
+        self.assert_constant('/admin/apartments/amenity/', 5)
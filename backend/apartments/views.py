@@ -1,180 +1,186 @@
+import json
+
+from django.db.models import Avg, Count, Min
+from django.db.models.functions import Substr
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
-from django.db.models import Q
-from datetime import datetime
-from .models import Apartment
-from bookings.models import Booking
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.permissions import AllowAny, IsAdminUser
+from .pagination import SearchCursorPagination
 from .serializers import ApartmentSearchSerializer
-from math import radians, cos, sin, asin, sqrt
-
-
-def haversine_distance(lat1, lon1, lat2, lon2):
-    R = 6371  # km
-    d_lat = radians(lat2 - lat1)
-    d_lon = radians(lon2 - lon1)
-    a = sin(d_lat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lon / 2) ** 2
-    c = 2 * asin(sqrt(a))
-    return R * c
+from .services import search_cache, search_engine
+from .services.autocomplete import location_index
+from .services.geo import cluster_precision, nearest, viewport_q
+from .services.search_engine import ListingQuery, QueryError
 
 
 class PropertySearchAPIView(APIView):
     permission_classes = [AllowAny]
+    pagination_class = SearchCursorPagination
 
-    def get(self, request):
-        browse_all = request.GET.get('browse_all', 'false').lower() == 'true'
-
-        location = request.GET.get('location')
-        check_in = request.GET.get('check_in')
-        check_out = request.GET.get('check_out')
-        guests = request.GET.get('guests', 1)
+    stream_chunk_size = 500
 
+    def parse_query(self, request, located=False):
+        """Return (ListingQuery, error response)."""
         try:
-            guests = int(guests)
-        except (TypeError, ValueError):
-            return Response({'error': 'Invalid guest count'}, status=status.HTTP_400_BAD_REQUEST)
-
-        if not browse_all:
-            if not location or not check_in or not check_out:
-                return Response(
-                    {'error': 'Missing required fields: check_in, check_out, and location are required unless browse_all=true'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-        # Optional filters
-        min_price = request.GET.get('min_price')
-        max_price = request.GET.get('max_price')
-        property_type = request.GET.get('property_type')
-        amenities = request.GET.get('amenities')
-        bedrooms = request.GET.get('bedrooms')
-        bathrooms = request.GET.get('bathrooms')
-        min_size = request.GET.get('min_size')
-        max_size = request.GET.get('max_size')
-        has_photos = request.GET.get('has_photos')
-        ordering = request.GET.get('ordering')
-        lat = request.GET.get('lat')
-        lng = request.GET.get('lng')
-        radius_km = request.GET.get('radius_km')
-
-        queryset = Apartment.objects.filter(is_available=True)
-
-        if location:
-            queryset = queryset.filter(
-                Q(city__icontains=location) |
-                Q(country__icontains=location) |
-                Q(address__icontains=location)
-            )
+            return ListingQuery.from_params(request.GET, located=located), None
+        except QueryError as exc:
+            return None, Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        if lat and lng and radius_km:
-            try:
-                lat = float(lat)
-                lng = float(lng)
-                radius_km = float(radius_km)
-                nearby_ids = [
-                    apt.id for apt in queryset
-                    if apt.latitude and apt.longitude and haversine_distance(lat, lng, apt.latitude, apt.longitude) <= radius_km
-                ]
-                queryset = queryset.filter(id__in=nearby_ids)
-            except ValueError:
-                pass
-
-        if check_in and check_out:
-            try:
-                check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
-                check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
-
-                if check_in_date >= check_out_date:
-                    return Response({'error': 'Check-out date must be after check-in date'}, status=status.HTTP_400_BAD_REQUEST)
-
-                unavailable = Booking.objects.filter(
-                    Q(start_date__lte=check_out_date) &
-                    Q(end_date__gte=check_in_date) &
-                    Q(status__in=['approved', 'pending'])
-                ).values_list('apartment_id', flat=True)
-
-                queryset = queryset.exclude(id__in=unavailable)
-
-            except ValueError:
-                return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
-        elif check_in or check_out:
-            return Response({'error': 'Both check_in and check_out must be provided together.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        queryset = queryset.filter(bedrooms__gte=(guests + 1) // 2)
-
-        if bedrooms:
-            try:
-                queryset = queryset.filter(bedrooms__gte=int(bedrooms))
-            except ValueError:
-                pass
-        if bathrooms:
-            try:
-                queryset = queryset.filter(bathrooms__gte=int(bathrooms))
-            except ValueError:
-                pass
-        if min_size:
-            try:
-                queryset = queryset.filter(size_sqm__gte=int(min_size))
-            except ValueError:
-                pass
-        if max_size:
-            try:
-                queryset = queryset.filter(size_sqm__lte=int(max_size))
-            except ValueError:
-                pass
-
-        if min_price:
-            try:
-                queryset = queryset.filter(price_per_month__gte=float(min_price))
-            except ValueError:
-                pass
-        if max_price:
-            try:
-                queryset = queryset.filter(price_per_month__lte=float(max_price))
-            except ValueError:
-                pass
-
-        if property_type:
-            queryset = queryset.filter(property_type__name__iexact=property_type)
-
-        if amenities:
-            for amenity in [a.strip() for a in amenities.split(',') if a.strip()]:
-                queryset = queryset.filter(amenities__name__iexact=amenity)
-
-        if has_photos and has_photos.lower() == 'true':
-            queryset = queryset.filter(images__isnull=False).distinct()
-
-        allowed_fields = ['price_per_month', '-price_per_month', 'size_sqm', '-size_sqm', 'created_at', '-created_at']
-        if ordering in allowed_fields:
-            queryset = queryset.order_by(ordering)
-
-        queryset = queryset.distinct()
-        serializer = ApartmentSearchSerializer(queryset, many=True)
+    def get(self, request):
+        query, error = self.parse_query(request)
+        if error is not None:
+            return error
+        if request.GET.get('stream') == 'ndjson':
+            return self.stream(request, query)
+
+        page, meta = search_engine.search_page(query, request, self.pagination_class())
+        serializer = ApartmentSearchSerializer(page, many=True, context={'request': request})
+        return Response({**meta, 'results': serializer.data})
+
+    def stream(self, request, query):
+        """Stream every match as newline-delimited JSON, in id order.
+
+        Rows are read through a server-side cursor and serialized a chunk at
+        a time, so memory stays flat and the first rows go out immediately
+        however large the catalog is.
+        """
+        context = {'request': request}
+        queryset = search_engine.queryset(query).for_listing().order_by('pk')
+
+        def rows():
+            batch = []
+            for apartment in queryset.iterator(chunk_size=self.stream_chunk_size):
+                batch.append(apartment)
+                if len(batch) >= self.stream_chunk_size:
+                    yield self.ndjson(batch, context)
+                    batch = []
+            if batch:
+                yield self.ndjson(batch, context)
+
+        return StreamingHttpResponse(rows(), content_type='application/x-ndjson')
+
+    def ndjson(self, apartments, context):
+        # The shared context keeps the user's favorite IDs across chunks.
+        data = ApartmentSearchSerializer(apartments, many=True, context=context).data
+        return ''.join(json.dumps(row, cls=JSONEncoder) + '\n' for row in data)
+
+
+class MapSearchAPIView(PropertySearchAPIView):
+    """Listings inside a map viewport, clustered by geohash when zoomed out.
+
+    Takes `bbox=south,west,north,east` and `zoom` plus the /api/search/
+    filters; the viewport replaces the location and dates /api/search/
+    requires. Below `marker_zoom`, or when the viewport holds more than
+    `max_markers` listings, the response is one row per geohash cell with
+    its count, centroid and lowest price, from a single GROUP BY.
+    """
+    marker_zoom = 14
+    max_markers = 500
 
+    def get(self, request):
+        try:
+            south, west, north, east = search_engine.viewport(request.GET.get('bbox'))
+        except QueryError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            zoom = min(max(int(request.GET.get('zoom', 10)), 0), 22)
+        except ValueError:
+            return Response({'error': 'Invalid zoom'}, status=status.HTTP_400_BAD_REQUEST)
+
+        query, error = self.parse_query(request, located=True)
+        if error is not None:
+            return error
+        queryset = search_engine.queryset(query).filter(viewport_q(south, west, north, east)).order_by()
+
+        if zoom >= self.marker_zoom:
+            markers = list(
+                queryset.values_list('id', 'latitude', 'longitude', 'price_per_month')[:self.max_markers + 1]
+            )
+            if len(markers) <= self.max_markers:
+                return Response({
+                    'zoom': zoom,
+                    'markers': [
+                        {'id': pk, 'lat': lat, 'lng': lng, 'price': price}
+                        for pk, lat, lng, price in markers
+                    ],
+                })
+
+        precision = cluster_precision(zoom)
+        cells = (
+            queryset
+            .annotate(cell=Substr('geohash', 1, precision))
+            .values('cell')
+            .annotate(
+                count=Count('id'),
+                lat=Avg('latitude'),
+                lng=Avg('longitude'),
+                min_price=Min('price_per_month'),
+            )
+        )
         return Response({
-            'count': queryset.count(),
-            'results': serializer.data
+            'zoom': zoom,
+            'precision': precision,
+            'clusters': [
+                {
+                    'geohash': cell['cell'],
+                    'count': cell['count'],
+                    'lat': round(cell['lat'], 6),
+                    'lng': round(cell['lng'], 6),
+                    'min_price': cell['min_price'],
+                }
+                for cell in cells
+            ],
         })
 
 
+class NearestSearchAPIView(PropertySearchAPIView):
+    """The `k` listings closest to `lat`/`lng` that match the search filters.
+
+    The point replaces the location and dates /api/search/ requires.
+    """
+    max_k = 100
+
+    def get(self, request):
+        try:
+            k = min(max(int(request.GET.get('k', 20)), 1), self.max_k)
+        except ValueError:
+            return Response({'error': 'Invalid k'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # from_params() rejects non-finite coordinates and brings them in range.
+        query, error = self.parse_query(request, located=True)
+        if error is not None:
+            return error
+        if query.lat is None or query.lng is None:
+            return Response({'error': 'lat and lng are required'}, status=status.HTTP_400_BAD_REQUEST)
+        apartments = nearest(search_engine.queryset(query).for_listing(), query.lat, query.lng, k)
+        serializer = ApartmentSearchSerializer(apartments, many=True, context={'request': request})
+        return Response({'results': serializer.data})
+
+
+class SearchCacheStatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({**search_cache.stats(), 'engine': search_engine.stats()})
+
+
 class LocationAutocompleteAPIView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
         query = request.GET.get('q', '')
-        if len(query) >= 2:
-            locations = Apartment.objects.filter(
-                Q(city__icontains=query) |
-                Q(country__icontains=query)
-            ).values('city', 'country').distinct()[:5]
-
+        if len(query.strip()) >= 2:
             suggestions = [
                 {
-                    'city': loc['city'],
-                    'country': loc['country'],
-                    'display': f"{loc['city']}, {loc['country']}"
+                    'city': city,
+                    'country': country,
+                    'display': f"{city}, {country}",
+                    'listings': listings
                 }
-                for loc in locations
+                for city, country, listings in location_index.suggest(query)
             ]
             return Response({'suggestions': suggestions})
         return Response({'suggestions': []})
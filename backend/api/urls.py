@@ -11,7 +11,8 @@ from .views import (
     ReviewViewSet, AmenityViewSet
 )
 from apartments.views import (
-    PropertySearchAPIView, LocationAutocompleteAPIView
+    PropertySearchAPIView, LocationAutocompleteAPIView, MapSearchAPIView, NearestSearchAPIView,
+    SearchCacheStatsAPIView
 )
 from reviews.views import LandlordReviewViewSet
 
@@ -26,15 +27,17 @@ router.register(r'amenities', AmenityViewSet)
 router.register(r'landlord-reviews', LandlordReviewViewSet, basename='landlord-review')
 
 urlpatterns = [
-    path('', include(router.urls)),
-
     # JWT authentication
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
-    # Search & autocomplete
+    # Search & autocomplete (before the router, whose apartments/<pk>/ would shadow them)
     path('search/', PropertySearchAPIView.as_view(), name='apartment-search'),
+    path('search/nearest/', NearestSearchAPIView.as_view(), name='apartment-nearest-search'),
+    path('search/map/', MapSearchAPIView.as_view(), name='apartment-map-search'),
+    path('search/cache-stats/', SearchCacheStatsAPIView.as_view(), name='search-cache-stats'),
     path('apartments/locations/', LocationAutocompleteAPIView.as_view(), name='location-autocomplete'),
 
+    path('', include(router.urls)),
 ]
 
@@ -6,14 +6,13 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from django_filters.rest_framework import DjangoFilterBackend
-from django.core.mail import send_mail
+from django.db import transaction
 from django.utils.timezone import now
-from django.conf import settings
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from django.db.models import Avg, Count
+from django.db.models import F
 from django.contrib.auth import get_user_model
-from datetime import date, timedelta
+from datetime import date
 from django.utils import timezone
 from bookings.models import BookingDocument
 
@@ -22,8 +21,11 @@ from bookings.models import BookingDocument
 
 from bookings.models import Booking
 from bookings.serializers import BookingSerializer, BookingDocumentUploadSerializer
+from apartments.filters import ListingSearchFilter
 from apartments.models import Apartment, Amenity
-from apartments.serializers import ApartmentSerializer, AmenitySerializer
+from apartments.serializers import ApartmentSearchSerializer, ApartmentSerializer, AmenitySerializer
+from apartments.services import availability, counters, similarity
+from notifications import outbox
 from users.serializers import UserSerializer
 from reviews.models import Review, LandlordReview
 from reviews.serializers import ReviewSerializer, LandlordReviewSerializer
@@ -62,24 +64,42 @@ class UserViewSet(viewsets.ModelViewSet):
 
 
 class ApartmentViewSet(viewsets.ModelViewSet):
-    queryset = Apartment.objects.annotate(
-        annotated_rating=Avg('reviews__rating'),
-        review_count=Count('reviews')
-    )
+    # Ratings are stored columns (services/ratings.py); annotated_rating is
+    # kept as an ordering alias.
+    queryset = Apartment.objects.annotate(annotated_rating=F('average_rating'))
     serializer_class = ApartmentSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ListingSearchFilter, filters.OrderingFilter]
     filterset_fields = ['city', 'bedrooms', 'is_available']
-    search_fields = ['title', 'description', 'address', 'city']
+    # Matches text_search.TEXT_FIELDS, the columns of the full-text index.
+    search_fields = ['title', 'description', 'address', 'city', 'country']
     ordering_fields = ['price_per_month', 'created_at', 'annotated_rating', 'review_count']
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'similar', 'calendar']:
             return [permissions.AllowAny()]
         return [permissions.IsAuthenticated()]
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        apartment = self.get_object()
+        counters.increment(apartment.pk, 'views_count')  # buffered, see services/counters.py
+        serializer = self.get_serializer(apartment)
+        return Response(serializer.data)
+
+    @swagger_auto_schema(tags=['Apartments'])
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        apartment = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+        apartments = similarity.similar_apartments(apartment, limit)
+        serializer = ApartmentSearchSerializer(apartments, many=True, context={'request': request})
+        return Response(serializer.data)
+
     @swagger_auto_schema(tags=['Apartments'])
     @action(detail=True, methods=['post'])
     def add_images(self, request, pk=None):
@@ -108,16 +128,31 @@ class ApartmentViewSet(viewsets.ModelViewSet):
 
         return Response({'available': available})
 
+    @swagger_auto_schema(tags=['Apartments'])
+    @action(detail=True, methods=['get'])
+    def calendar(self, request, pk=None):
+        """Unavailable nights from `from` to `to` (YYYY-MM months, inclusive).
 
-        # Gather all unavailable dates
-        unavailable_dates = set()
-        for booking in bookings:
-            current = booking.check_in
-            while current < booking.check_out:
-                unavailable_dates.add(current.isoformat())
-                current += timedelta(days=1)
-
-        return Response({'unavailable_dates': sorted(unavailable_dates)}, status=status.HTTP_200_OK)
+        Each interval covers the nights [start, end); `end` is the first
+        free day, i.e. the check-out date of the last booking.
+        """
+        apartment = self.get_object()
+        first_month = request.query_params.get('from', date.today().strftime('%Y-%m'))
+        last_month = request.query_params.get('to', first_month)
+        try:
+            first = availability.month_index(date.fromisoformat(f'{first_month}-01'))
+            last = availability.month_index(date.fromisoformat(f'{last_month}-01')) + 1
+        except ValueError:
+            return Response({'error': 'Months must be formatted as YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < last - first <= 24:
+            return Response({'error': 'Request between 1 and 24 months'}, status=status.HTTP_400_BAD_REQUEST)
+
+        intervals = availability.unavailable_intervals(apartment.pk, first, last)
+        return Response({
+            'from': availability.month_start(first),
+            'to': availability.month_start(last - 1),
+            'unavailable': [{'start': start, 'end': end} for start, end in intervals],
+        })
 
 class ReviewViewSet(viewsets.ModelViewSet):
     queryset = Review.objects.all()
@@ -160,26 +195,28 @@ class BookingViewSet(viewsets.ModelViewSet):
     ordering_fields = ['start_date', 'created_at']
 
     def get_queryset(self):
+        # Ended stays are completed by the complete_expired_bookings command.
         user = self.request.user
-        outdated_bookings = Booking.objects.filter(
-            status__in=['approved', 'pending'],
-            end_date__lt=now().date()
-        )
-        outdated_bookings.update(status='completed')
-
         if user.user_type == 'landlord':
             return Booking.objects.filter(apartment__owner=user)
         return Booking.objects.filter(tenant=user)
 
     def perform_create(self, serializer):
-        booking = serializer.save(tenant=self.request.user)
-        send_mail(
-            subject='Booking Confirmation',
-            message=f"Thank you for your booking!\\n\\nApartment: {booking.apartment.title}\\nLocation: {booking.apartment.city}, {booking.apartment.country}\\nDates: {booking.start_date} to {booking.end_date}\\nTotal Price: {booking.total_price}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[booking.tenant.email],
-            fail_silently=True
-        )
+        # The confirmation is queued in the booking's transaction and sent
+        # by the deliver_outbox worker.
+        with transaction.atomic():
+            booking = serializer.save(tenant=self.request.user)
+            outbox.enqueue(
+                subject='Booking Confirmation',
+                recipients=[booking.tenant.email],
+                body=(
+                    f"Thank you for your booking!\n\n"
+                    f"Apartment: {booking.apartment.title}\n"
+                    f"Location: {booking.apartment.city}, {booking.apartment.country}\n"
+                    f"Dates: {booking.start_date} to {booking.end_date}\n"
+                    f"Total Price: {booking.total_price}"
+                ),
+            )
 
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
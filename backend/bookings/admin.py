@@ -1,6 +1,10 @@
 from django.contrib import admin
+from django.db.models import Exists, OuterRef
 from django.utils.html import format_html
-from datetime import date
+from django.utils import timezone
+from apartments.pagination import EstimatedCountPaginator
+from apartments.services import availability
+from reviews.models import Review
 from .models import Booking, BookingDocument
 
 class BookingDocumentInline(admin.TabularInline):
@@ -21,7 +25,7 @@ class BookingStatusFilter(admin.SimpleListFilter):
         )
 
     def queryset(self, request, queryset):
-        today = date.today()
+        today = timezone.localdate()
         if self.value() == 'active':
             return queryset.filter(start_date__lte=today, end_date__gte=today)
         if self.value() == 'past':
@@ -53,6 +57,12 @@ class BookingAdmin(admin.ModelAdmin):
         'apartment__title',
         'id'
     )
+    # Sized for millions of rows: no full <select> of users or apartments,
+    # no exact COUNT(*) per page, and date navigation over indexed columns.
+    autocomplete_fields = ('tenant', 'apartment')
+    date_hierarchy = 'start_date'
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     inlines = [BookingDocumentInline]
     actions = ['approve_bookings', 'reject_bookings', 'mark_as_completed']
     
@@ -64,19 +74,27 @@ class BookingAdmin(admin.ModelAdmin):
             'fields': ('start_date', 'end_date', 'total_price')
         }),
         ('Timestamps', {
-            'fields': ('created_at', 'updated_at'),
+            'fields': ('approved_at', 'rejected_at', 'cancelled_at', 'completed_at', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('approved_at', 'rejected_at', 'cancelled_at', 'completed_at', 'created_at', 'updated_at')
+
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request)
+            .select_related('tenant', 'apartment')
+            .annotate(reviewed=Exists(Review.objects.filter(booking=OuterRef('pk'))))
+        )
 
     def apartment_link(self, obj):
         return format_html(
             '<a href="/admin/apartments/apartment/{}/">{}</a>',
-            obj.apartment.id,
+            obj.apartment_id,
             obj.apartment.title
         )
     apartment_link.short_description = 'Apartment'
+    apartment_link.admin_order_field = 'apartment__title'
 
     def booking_duration(self, obj):
         duration = (obj.end_date - obj.start_date).days
@@ -84,19 +102,27 @@ class BookingAdmin(admin.ModelAdmin):
     booking_duration.short_description = 'Duration'
 
     def has_review(self, obj):
-        return hasattr(obj, 'review')
+        return obj.reviewed
     has_review.boolean = True
     has_review.short_description = 'Reviewed'
+    has_review.admin_order_field = 'reviewed'
+
+    def _set_status(self, queryset, status, stamp):
+        # Read the ranges first: on a changelist filtered by status the
+        # updated rows drop out of the queryset.
+        ranges = list(queryset.values_list('apartment_id', 'start_date', 'end_date'))
+        now = timezone.now()
+        queryset.update(status=status, updated_at=now, **{stamp: now})
+        availability.refresh_bookings(ranges)
 
     def approve_bookings(self, request, queryset):
-        queryset.update(status='approved')
+        self._set_status(queryset, 'approved', 'approved_at')
     approve_bookings.short_description = "Approve selected bookings"
 
     def reject_bookings(self, request, queryset):
-        queryset.update(status='rejected')
+        self._set_status(queryset, 'rejected', 'rejected_at')
     reject_bookings.short_description = "Reject selected bookings"
 
     def mark_as_completed(self, request, queryset):
-        queryset.update(status='completed')
+        self._set_status(queryset, 'completed', 'completed_at')
     mark_as_completed.short_description = "Mark selected bookings as completed"
-
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:02
+
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+# Pending and approved bookings of one apartment may not share a night. The
+# constraint works on daterange(start_date, end_date, '[)'), so a check-out
+# day can be the next guest's check-in. Other databases rely on the row lock
+# taken in BookingSerializer instead.
+CONSTRAINT = 'bookings_booking_no_overlap'
+
+
+def add_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT a.id, b.id FROM bookings_booking a JOIN bookings_booking b "
+            "ON a.apartment_id = b.apartment_id AND a.id < b.id "
+            "AND a.start_date < b.end_date AND b.start_date < a.end_date "
+            "WHERE a.status IN ('pending', 'approved') AND b.status IN ('pending', 'approved') "
+            "LIMIT 20"
+        )
+        overlaps = cursor.fetchall()
+    if overlaps:
+        raise RuntimeError(
+            f'Resolve the overlapping pending/approved bookings first (pairs of ids): {overlaps}'
+        )
+    schema_editor.execute(
+        f"ALTER TABLE bookings_booking ADD CONSTRAINT {CONSTRAINT} EXCLUDE USING gist "
+        f"(apartment_id WITH =, daterange(start_date, end_date, '[)') WITH &&) "
+        f"WHERE (status IN ('pending', 'approved'))"
+    )
+
+
+def drop_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'ALTER TABLE bookings_booking DROP CONSTRAINT IF EXISTS {CONSTRAINT}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_booking_booking_type'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.RunPython(add_constraint, drop_constraint),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0013_apartment_rating_aggregates'),
+        ('bookings', '0011_booking_completed_at_status_end_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['start_date'], name='bookings_bo_start_d_3e8155_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['end_date'], name='bookings_bo_end_dat_f79cb7_idx'),
+        ),
+    ]
@@ -89,10 +89,18 @@ class Booking(models.Model):
     approved_at = models.DateTimeField(null=True, blank=True)
     rejected_at = models.DateTimeField(null=True, blank=True)
     cancelled_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'end_date']),
+            models.Index(fields=['start_date']),
+            models.Index(fields=['end_date']),
+        ]
+
     def __str__(self):
         return f"Booking for {self.apartment.title} by {self.tenant.email}"
 
@@ -1,7 +1,11 @@
+from django.db import IntegrityError, connections, transaction
 from rest_framework import serializers
+from apartments.models import Apartment
+from apartments.services.availability import BLOCKING_STATUSES
 from .models import Booking, BookingDocument
 from django.utils.translation import gettext_lazy as _
 from datetime import timedelta
+from functools import partial
 from decimal import Decimal
 
 class BookingDocumentSerializer(serializers.ModelSerializer):
@@ -23,6 +27,23 @@ class BookingDocumentUploadSerializer(serializers.ModelSerializer):
 
 
 
+# Name of the PostgreSQL exclusion constraint added in bookings 0010.
+NO_OVERLAP_CONSTRAINT = 'bookings_booking_no_overlap'
+UNAVAILABLE_MESSAGE = _("This apartment is not available for the selected dates.")
+
+
+def overlapping_bookings(apartment, start_date, end_date, exclude_id=None):
+    overlapping = Booking.objects.filter(
+        apartment=apartment,
+        status__in=BLOCKING_STATUSES,
+        start_date__lt=end_date,
+        end_date__gt=start_date
+    )
+    if exclude_id is not None:
+        overlapping = overlapping.exclude(id=exclude_id)
+    return overlapping
+
+
 class BookingSerializer(serializers.ModelSerializer):
     documents = BookingDocumentSerializer(many=True, read_only=True)
     message = serializers.CharField(required=False, allow_blank=True)
@@ -33,13 +54,13 @@ class BookingSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'tenant', 'apartment', 'booking_type', 'start_date', 'end_date',
             'guest_count', 'status', 'payment_status', 'total_price',
-            'message', 'approved_at', 'rejected_at', 'cancelled_at',
+            'message', 'approved_at', 'rejected_at', 'cancelled_at', 'completed_at',
             'refund_status', 'refund_amount', 'refunded_at',
             'created_at', 'updated_at', 'documents'
         ]
         read_only_fields = [
             'tenant', 'status', 'payment_status', 'approved_at', 'rejected_at',
-            'cancelled_at', 'created_at', 'updated_at', 'documents',
+            'cancelled_at', 'completed_at', 'created_at', 'updated_at', 'documents',
             'total_price', 'refund_status', 'refund_amount', 'refunded_at',
         ]
 
@@ -57,21 +78,35 @@ class BookingSerializer(serializers.ModelSerializer):
                 f"Guest count exceeds the apartment's maximum capacity of {apartment.max_guests}."
             ))
 
-        overlapping = Booking.objects.filter(
-            apartment=apartment,
-            status__in=['approved', 'pending'],
-            start_date__lt=end_date,
-            end_date__gt=start_date
-        )
-
-        if self.instance:
-            overlapping = overlapping.exclude(id=self.instance.id)
-
-        if overlapping.exists():
-            raise serializers.ValidationError(_("This apartment is not available for the selected dates."))
+        # Early, friendly answer; _save_exclusive() is what makes it hold.
+        if overlapping_bookings(apartment, start_date, end_date, self.instance and self.instance.id).exists():
+            raise serializers.ValidationError(UNAVAILABLE_MESSAGE)
 
         return data
 
+    def _save_exclusive(self, save, validated_data):
+        """Run `save` so that no overlapping booking can commit alongside it.
+
+        PostgreSQL enforces this with the exclusion constraint. Elsewhere the
+        apartment row is locked and the overlap checked again, so concurrent
+        requests wait only for bookings of the same apartment.
+        """
+        apartment = validated_data.get('apartment') or self.instance.apartment
+        start_date = validated_data.get('start_date') or self.instance.start_date
+        end_date = validated_data.get('end_date') or self.instance.end_date
+        try:
+            with transaction.atomic():
+                if connections[Booking.objects.db].vendor != 'postgresql':
+                    Apartment.objects.select_for_update().only('pk').get(pk=apartment.pk)
+                    exclude_id = self.instance and self.instance.id
+                    if overlapping_bookings(apartment, start_date, end_date, exclude_id).exists():
+                        raise serializers.ValidationError(UNAVAILABLE_MESSAGE)
+                return save(validated_data)
+        except IntegrityError as exc:
+            if NO_OVERLAP_CONSTRAINT in str(exc):
+                raise serializers.ValidationError(UNAVAILABLE_MESSAGE)
+            raise
+
     def create(self, validated_data):
         apartment = validated_data['apartment']
         booking_type = validated_data.get('booking_type', 'night')
@@ -85,7 +120,10 @@ class BookingSerializer(serializers.ModelSerializer):
         else:
             raise serializers.ValidationError("Invalid booking type.")
 
-        return super().create(validated_data)
+        return self._save_exclusive(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._save_exclusive(partial(super().update, instance), validated_data)
 
     def get_refund_amount(self, obj):
         # Placeholder logic for refunds
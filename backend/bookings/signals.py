@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apartments.services import availability, counters, search_cache
+from .models import Booking
+
+
+@receiver(pre_save, sender=Booking)
+def remember_previous_dates(sender, instance, **kwargs):
+    instance._previous_range = None
+    if instance.pk:
+        instance._previous_range = (
+            Booking.objects
+            .filter(pk=instance.pk)
+            .values_list('apartment_id', 'start_date', 'end_date')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Booking)
+def refresh_booking_availability(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_range', None)
+    if previous and previous != (instance.apartment_id, instance.start_date, instance.end_date):
+        availability.refresh(*previous)
+    availability.refresh(instance.apartment_id, instance.start_date, instance.end_date)
+    search_cache.invalidate_apartments([instance.apartment_id])
+
+
+@receiver(post_save, sender=Booking)
+def count_booking(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(instance.apartment_id, 'bookings_count')
+
+
+@receiver(post_delete, sender=Booking)
+def clear_booking_availability(sender, instance, **kwargs):
+    availability.refresh(instance.apartment_id, instance.start_date, instance.end_date)
+    search_cache.invalidate_apartments([instance.apartment_id])
+    counters.increment(instance.apartment_id, 'bookings_count', -1)
@@ -1,3 +1,89 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from apartments.models import Apartment
+from apartments.services import availability, search_cache
+from apartments.testing import AdminChangelistTestMixin
+from reviews.models import Review
+from .models import Booking
+
+
+class BookingAdminQueryCountTests(AdminChangelistTestMixin, TestCase):
+    """The booking changelist must cost the same number of queries at any size."""
+
+    def listing_created(self, apartment, booking):
+        if self.created % 2:
+            Review.objects.create(booking=booking, reviewer=booking.tenant, apartment=apartment, rating=4, comment='Nice')
+
+    def test_changelist_query_count(self):
+        self.assert_constant('/admin/bookings/booking/', 6)
+
+    def test_sorted_by_review_flag(self):
+        self.add_listings(3)
+        # has_review is the 9th column in list_display.
+        self.assertLessEqual(self.changelist_queries('/admin/bookings/booking/?o=-9'), 6)
+
+
+class BookingAdminActionTests(AdminChangelistTestMixin, TestCase):
+
+    def test_reject_on_filtered_changelist_frees_dates(self):
+        self.add_listings(1)
+        apartment = Apartment.objects.get()
+        start = timezone.localdate() + timedelta(days=10)
+        end = start + timedelta(days=3)
+        booking = Booking.objects.create(
+            tenant=self.admin, apartment=apartment, status='pending',
+            start_date=start, end_date=end, total_price=100
+        )
+        self.assertFalse(availability.exclude_booked(Apartment.objects.all(), start, end).exists())
+
+        # The rejected booking drops out of the filtered queryset once updated.
+        response = self.client.post('/admin/bookings/booking/?status__exact=pending', {
+            'action': 'reject_bookings',
+            '_selected_action': [booking.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'rejected')
+        self.assertTrue(availability.exclude_booked(Apartment.objects.all(), start, end).exists())
+
+
+class AvailabilityHorizonTests(AdminChangelistTestMixin, TestCase):
+
+    def test_month_entering_horizon_is_built(self):
+        self.add_listings(1)
+        apartment = Apartment.objects.get()
+        first, last = availability.horizon()
+        # The first month past today's horizon.
+        start = availability.month_start(last) + timedelta(days=2)
+        end = start + timedelta(days=3)
+        Booking.objects.create(
+            tenant=self.admin, apartment=apartment, status='pending',
+            start_date=start, end_date=end, total_price=100
+        )
+        # Next month, before the daily rebuild has rolled the horizon.
+        with mock.patch('django.utils.timezone.localdate', return_value=availability.month_start(first + 1)):
+            self.assertTrue(availability._in_horizon(start, end))
+            self.assertFalse(availability.exclude_booked(Apartment.objects.all(), start, end).exists())
+
+class BookingSearchCacheTests(AdminChangelistTestMixin, TestCase):
 
-# Create your tests here.
+    def test_search_versions_bump_on_commit(self):
+        self.add_listings(1)
+        apartment = Apartment.objects.get()
+        cache.clear()
+        start = timezone.localdate() + timedelta(days=10)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Booking.objects.create(
+                tenant=self.admin, apartment=apartment, status='pending',
+                start_date=start, end_date=start + timedelta(days=3), total_price=100
+            )
+            # A search running before the commit must not see new versions.
+            self.assertEqual(search_cache._tag_versions([search_cache.ALL_TAG]), {search_cache.ALL_TAG: 0})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(search_cache._tag_versions([search_cache.ALL_TAG]), {search_cache.ALL_TAG: 1})
@@ -9,7 +9,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from apartments.models import Apartment  # Import your model
+from apartments.services import search_engine
 from dateutil import parser
 from datetime import datetime
 import dateparser
@@ -90,15 +90,11 @@ class ChatGPTView(APIView):
         guest_count = extract_guest_count(user_message)
         print("Guest Count:", guest_count)
 
-        # ✅ Build filter
-        filters = {"is_available": True}
-        if city:
-            filters["city__iexact"] = city
-        if guest_count:
-            filters["max_guests__gte"] = guest_count
+        # ✅ Build query
+        query = search_engine.ListingQuery(city=city or '', guests=guest_count or None)
 
         # ✅ Query apartments
-        apartments = Apartment.objects.filter(**filters)
+        apartments = search_engine.queryset(query).for_listing()
         apartments_text = format_apartments(apartments)
 
         print("\n==== Apartment Listings Sent to GPT ====\n")
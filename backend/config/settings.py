@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'bookings.apps.BookingsConfig',
     'reviews.apps.ReviewsConfig',
     'favorites',
+    'notifications.apps.NotificationsConfig',
 ]
 
 MIDDLEWARE = [
@@ -232,12 +233,40 @@ SIMPLE_JWT = {
 }
 
 # Cache settings
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Search, calendar and favorites invalidation, the buffered apartment
+# counters, the scheduler claims and the autocomplete generation are coordinated through the cache,
+# so every gunicorn worker and management command must share it: Redis when
+# REDIS_URL is set, otherwise the database cache table (created by the
+# Procfile release step). Only a DEBUG runserver, a single process, keeps a
+# local in-memory cache.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
     }
-}
+elif DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
+# Apartment counters are buffered in a cache whose incr() is atomic across
+# processes (Redis); without one, views are buffered per process and the
+# other counters written straight through (see services/counters.py).
+COUNTERS_CACHE = 'default' if REDIS_URL else None
 
 # Security settings
 ON_RAILWAY = 'RAILWAY_STATIC_URL' in os.environ
@@ -267,4 +296,12 @@ DEFAULT_FROM_EMAIL = 'noreply@rentify.test'
 
 # Search settings
 SEARCH_RESULTS_PER_PAGE = 12
+SEARCH_CACHE_TIMEOUT = 300  # seconds, backstop for the tag-based invalidation
+# Evaluate /api/search/ filters on an in-process NumPy copy of the catalog
+SEARCH_SNAPSHOT_ENABLED = os.getenv('SEARCH_SNAPSHOT_ENABLED', 'False') == 'True'
+SIMILAR_CACHE_TIMEOUT = 3600  # seconds, cached "similar apartments" per listing
+# Rank similar apartments by the NumPy feature matrix rather than same city and price
+SIMILARITY_MATRIX_ENABLED = os.getenv('SIMILARITY_MATRIX_ENABLED', 'True') == 'True'
+CALENDAR_CACHE_TIMEOUT = 86400  # seconds, backstop for the per-month calendar cache
+FAVORITES_CACHE_TIMEOUT = 86400  # seconds, per-user favorite ID sets (versioned, see services/favorite_ids.py)
 
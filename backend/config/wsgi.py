@@ -10,7 +10,21 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.db import DatabaseError, connections
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Each gunicorn worker imports this module, so per-worker indexes are built
+# here, before the first request. If the database is not reachable yet the
+# index is built on first use instead of failing the worker boot. The
+# connection is closed so a preloading master never hands it to its workers.
+from apartments.services.autocomplete import location_index  # noqa: E402
+
+try:
+    location_index.warm()
+except DatabaseError:
+    pass
+finally:
+    connections.close_all()
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apartments.services import favorite_ids
+from .models import Favorite
+
+# The favorites counter (which also nudges the ranking score) and the user's
+# cached favorite IDs are updated in favorite_ids.record_change(). Cached search pages are not
+# invalidated: ordering=recommended pages pick up the new score when they
+# expire, which is cheaper than dropping every cached page on each click.
+
+
+@receiver(post_save, sender=Favorite)
+def record_favorite(sender, instance, created, **kwargs):
+    if created:
+        favorite_ids.record_change(instance.user_id, instance.apartment_id, added=True)
+
+
+@receiver(post_delete, sender=Favorite)
+def record_unfavorite(sender, instance, **kwargs):
+    favorite_ids.record_change(instance.user_id, instance.apartment_id, added=False)
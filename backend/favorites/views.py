@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from .models import Favorite
 from .serializers import FavoriteSerializer
 from apartments.models import Apartment
+from apartments.services import favorite_ids
 
 class FavoriteViewSet(viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
@@ -17,15 +18,13 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         apartment_id = request.data.get('apartment_id')
         if not apartment_id:
             return Response({'error': 'apartment_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            apartment_id = int(apartment_id)
+        except (TypeError, ValueError):
+            return Response({'error': 'Apartment not found'}, status=status.HTTP_404_NOT_FOUND)
 
         try:
-            apartment = Apartment.objects.get(id=apartment_id)
+            result = favorite_ids.toggle(request.user.pk, apartment_id)
         except Apartment.DoesNotExist:
             return Response({'error': 'Apartment not found'}, status=status.HTTP_404_NOT_FOUND)
-
-        favorite, created = Favorite.objects.get_or_create(user=request.user, apartment=apartment)
-
-        if not created:
-            favorite.delete()
-            return Response({'status': 'removed'})
-        return Response({'status': 'added'})
+        return Response({'status': result})
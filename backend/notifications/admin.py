@@ -0,0 +1,15 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import OutboxEmail
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        queryset.exclude(status='sent').update(status='pending', next_attempt_at=timezone.now())
+    retry_now.short_description = "Retry selected emails now"
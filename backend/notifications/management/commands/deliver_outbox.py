@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from notifications import outbox
+
+PURGE_INTERVAL = 3600.0  # seconds between purges with --loop
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued outbox emails in batches. Runs once by default; with "
+        "--loop it keeps polling and acts as the mail worker (the Procfile "
+        "worker process)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true')
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls with --loop.")
+        parser.add_argument('--keep-days', type=int, default=30, help="Delete sent emails older than this.")
+
+    def purge(self, keep_days):
+        return outbox.purge_sent(timezone.now() - timedelta(days=keep_days))
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            attempted = outbox.deliver(batch_size=options['batch_size'])
+            purged = self.purge(options['keep_days'])
+            self.stdout.write(self.style.SUCCESS(f"{attempted} emails attempted, {purged} old emails purged."))
+            return
+
+        purged_at = 0.0
+        while True:
+            close_old_connections()
+            outbox.deliver(batch_size=options['batch_size'])
+            if time.monotonic() - purged_at >= PURGE_INTERVAL:
+                self.purge(options['keep_days'])
+                purged_at = time.monotonic()
+            time.sleep(options['interval'])
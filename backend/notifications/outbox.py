@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+# Emails are written to OutboxEmail inside the caller's transaction, so they
+# exist exactly when the booking or user that caused them does, and requests
+# never wait on SMTP. The deliver_outbox command sends them in batches over
+# one mail connection; failures are retried with exponential backoff.
+#
+# Workers claim a batch with SELECT ... FOR UPDATE SKIP LOCKED, so several
+# can run at once without sending a message twice.
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 8
+RETRY_DELAY = timedelta(minutes=1)  # doubled after every failed attempt
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+def enqueue(subject, recipients, body='', html_body='', from_email=None):
+    """Queue an email; it is sent once the surrounding transaction commits."""
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+
+
+def retry_delay(attempts):
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def _message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.recipients,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _sent(email):
+    email.attempts += 1
+    email.status = 'sent'
+    email.sent_at = timezone.now()
+    email.last_error = ''
+
+
+def _failed(email, exc):
+    email.attempts += 1
+    email.last_error = repr(exc)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+
+
+def deliver_batch(batch_size=BATCH_SIZE):
+    """Send up to `batch_size` due emails; return how many were claimed."""
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if not batch:
+            return 0
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as exc:
+            for email in batch:
+                _failed(email, exc)
+        else:
+            try:
+                for email in batch:
+                    try:
+                        _message(email, connection).send()
+                    except Exception as exc:
+                        _failed(email, exc)
+                    else:
+                        _sent(email)
+            finally:
+                connection.close()
+
+        OutboxEmail.objects.bulk_update(
+            batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+        )
+    return len(batch)
+
+
+def deliver(batch_size=BATCH_SIZE):
+    """Send every due email; return how many were attempted."""
+    total = 0
+    while True:
+        claimed = deliver_batch(batch_size)
+        total += claimed
+        if claimed < batch_size:
+            return total
+
+
+def purge_sent(older_than):
+    """Delete emails sent before `older_than`."""
+    deleted, _ = OutboxEmail.objects.filter(status='sent', sent_at__lt=older_than).delete()
+    return deleted
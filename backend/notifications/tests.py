@@ -0,0 +1,85 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from . import outbox
+from .models import OutboxEmail
+
+
+class OutboxTests(TestCase):
+
+    def due_now(self):
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+
+    def test_enqueue_waits_for_delivery(self):
+        email = outbox.enqueue('Booking received', ['tenant@example.com'], body='Hello', html_body='<p>Hello</p>')
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(email.from_email, 'noreply@rentify.test')
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_enqueue_rolls_back_with_caller(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            outbox.enqueue('Booking received', ['tenant@example.com'], body='Hello')
+            raise RuntimeError
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_deliver_sends_due_emails(self):
+        outbox.enqueue('First', ['a@example.com'], body='One', html_body='<p>One</p>')
+        outbox.enqueue('Second', ['b@example.com', 'c@example.com'], body='Two')
+        later = outbox.enqueue('Later', ['d@example.com'], body='Three')
+        OutboxEmail.objects.filter(pk=later.pk).update(next_attempt_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(outbox.deliver(batch_size=1), 2)
+        self.assertEqual([message.subject for message in mail.outbox], ['First', 'Second'])
+        self.assertEqual(mail.outbox[0].alternatives, [('<p>One</p>', 'text/html')])
+        self.assertEqual(mail.outbox[1].to, ['b@example.com', 'c@example.com'])
+
+        sent = OutboxEmail.objects.filter(status='sent')
+        self.assertEqual(sent.count(), 2)
+        self.assertTrue(all(email.sent_at and email.attempts == 1 for email in sent))
+        self.assertEqual(OutboxEmail.objects.get(pk=later.pk).status, 'pending')
+
+    def test_failed_send_is_retried_with_backoff(self):
+        email = outbox.enqueue('Booking received', ['tenant@example.com'], body='Hello')
+        with mock.patch('django.core.mail.EmailMultiAlternatives.send', side_effect=OSError('refused')):
+            before = timezone.now()
+            outbox.deliver()
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ('pending', 1))
+            self.assertIn('refused', email.last_error)
+            self.assertGreaterEqual(email.next_attempt_at, before + timedelta(minutes=1))
+
+            # Not due yet, so not attempted again.
+            self.assertEqual(outbox.deliver(), 0)
+
+            for _ in range(2, outbox.MAX_ATTEMPTS + 1):
+                self.due_now()
+                outbox.deliver()
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ('failed', outbox.MAX_ATTEMPTS))
+
+        self.due_now()
+        self.assertEqual(outbox.deliver(), 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_retry_delay_doubles_up_to_the_cap(self):
+        self.assertEqual(outbox.retry_delay(1), timedelta(minutes=1))
+        self.assertEqual(outbox.retry_delay(2), timedelta(minutes=2))
+        self.assertEqual(outbox.retry_delay(4), timedelta(minutes=8))
+        self.assertEqual(outbox.retry_delay(20), outbox.MAX_RETRY_DELAY)
+
+    def test_connection_failure_defers_whole_batch(self):
+        outbox.enqueue('First', ['a@example.com'], body='One')
+        outbox.enqueue('Second', ['b@example.com'], body='Two')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=OSError('down')):
+            self.assertEqual(outbox.deliver(), 2)
+        self.assertEqual(list(OutboxEmail.objects.values_list('status', 'attempts')), [('pending', 1)] * 2)
+
+        self.due_now()
+        self.assertEqual(outbox.deliver(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(OutboxEmail.objects.exclude(status='sent').exists())
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
+from apartments.pagination import EstimatedCountPaginator
 from .models import Review
 
 class RatingFilter(admin.SimpleListFilter):
@@ -43,6 +44,10 @@ class ReviewAdmin(admin.ModelAdmin):
         'apartment__title',
         'comment'
     )
+    autocomplete_fields = ('reviewer', 'apartment')
+    raw_id_fields = ('booking',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     readonly_fields = ('created_at', 'updated_at')
     
     fieldsets = (
@@ -58,13 +63,17 @@ class ReviewAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('reviewer', 'apartment')
+
     def apartment_link(self, obj):
         return format_html(
             '<a href="/admin/apartments/apartment/{}/">{}</a>',
-            obj.apartment.id,
+            obj.apartment_id,
             obj.apartment.title
         )
     apartment_link.short_description = 'Apartment'
+    apartment_link.admin_order_field = 'apartment__title'
 
     def rating_stars(self, obj):
         stars = '★' * obj.rating + '☆' * (5 - obj.rating)
@@ -73,6 +82,7 @@ class ReviewAdmin(admin.ModelAdmin):
             stars
         )
     rating_stars.short_description = 'Rating'
+    rating_stars.admin_order_field = 'rating'
 
     def comment_preview(self, obj):
         return obj.comment[:50] + '...' if len(obj.comment) > 50 else obj.comment
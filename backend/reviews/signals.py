@@ -0,0 +1,33 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apartments.services import ratings
+from .models import Review
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = (
+            Review.objects
+            .filter(pk=instance.pk)
+            .values_list('apartment_id', 'rating')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def add_review_rating(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    current = (instance.apartment_id, instance.rating)
+    if previous == current:
+        return
+    if previous:
+        ratings.adjust(*previous, -1)
+    ratings.adjust(*current, 1)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    ratings.adjust(instance.apartment_id, instance.rating, -1)
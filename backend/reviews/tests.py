@@ -1,3 +1,14 @@
 from django.test import TestCase
 
-# Create your tests here.
+from apartments.testing import AdminChangelistTestMixin
+from .models import Review
+
+
+class ReviewAdminQueryCountTests(AdminChangelistTestMixin, TestCase):
+    """The review changelist must cost the same number of queries at any size."""
+
+    def listing_created(self, apartment, booking):
+        Review.objects.create(booking=booking, reviewer=booking.tenant, apartment=apartment, rating=5, comment='Great')
+
+    def test_changelist_query_count(self):
+        self.assert_constant('/admin/reviews/review/', 4)
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
+from apartments.pagination import EstimatedCountPaginator
 from .models import CustomUser
 
 class CustomUserAdmin(UserAdmin):
@@ -9,6 +10,9 @@ class CustomUserAdmin(UserAdmin):
     list_filter = ('user_type', 'is_active', 'is_staff', 'date_joined')
     search_fields = ('username', 'email', 'phone_number')
     ordering = ('-date_joined',)
+    date_hierarchy = 'date_joined'
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     
     # Custom actions
     actions = ['activate_users', 'deactivate_users']
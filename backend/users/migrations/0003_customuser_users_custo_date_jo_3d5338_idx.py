@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0002_customuser_is_verified'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['date_joined'], name='users_custo_date_jo_3d5338_idx'),
+        ),
+    ]
@@ -13,6 +13,11 @@ class CustomUser(AbstractUser):
     bio = models.TextField(blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
     is_verified = models.BooleanField(default=False)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['date_joined']),
+        ]
     
     def __str__(self):
         return self.email
@@ -2,6 +2,8 @@ from django.urls import path
 from .views import RegisterView
 from .views import VerifyEmailView
 
+app_name = 'users'
+
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('verify/<str:token>/', VerifyEmailView.as_view(), name='verify-email'),
@@ -1,6 +1,8 @@
 from django.core.signing import TimestampSigner
 from django.urls import reverse
 
+from notifications import outbox
+
 
 signer = TimestampSigner()
 
@@ -8,21 +10,18 @@ def generate_verification_token(user):
     return signer.sign(user.pk)
 
 def send_verification_email(user, request):
-    from .utils import generate_verification_token
+    """Queue the verification email; deliver_outbox sends it."""
     token = generate_verification_token(user)
     verification_url = request.build_absolute_uri(
         reverse("users:verify-email", args=[token])
     )
-    send_mail(
+    outbox.enqueue(
         subject="Verify Your Email",
-        message="",
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
-        html_message=f"""
+        recipients=[user.email],
+        html_body=f"""
         <p>Hello {user.first_name},</p>
         <p>Thank you for registering. Please verify your email by clicking below:</p>
         <a href="{verification_url}">Verify My Email</a>
         <p>If you did not sign up, ignore this email.</p>
         """
     )
-
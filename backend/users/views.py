@@ -9,6 +9,7 @@ from drf_yasg import openapi
 from django.core.mail import send_mail
 from .utils import send_verification_email
 from django.conf import settings
+from django.db import transaction
 from django.urls import reverse
 from django.core.signing import BadSignature, SignatureExpired
 from django.http import HttpResponse
@@ -36,11 +37,12 @@ class RegisterView(APIView):
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            user.is_verified = False  # require verification
-            user.save()
+            with transaction.atomic():
+                user = serializer.save()
+                user.is_verified = False  # require verification
+                user.save()
 
-            send_verification_email(user, request)  # <--- send the email
+                send_verification_email(user, request)  # queued with the user
 
             return Response({
                 "detail": "Registration successful. Please verify your email."